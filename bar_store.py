@@ -0,0 +1,88 @@
+from datetime import datetime
+import numpy as np
+
+
+class BarStore:
+    # Rolling close/value history for a fixed universe. Each row is written twice (at i and
+    # i + capacity) so the latest `capacity` values are always one contiguous slice, served as
+    # a read-only NumPy view without copying.
+    def __init__(self, symbols, capacity, max_gap_days=4):
+        self.symbols = list(symbols)
+        self.rows = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.capacity = capacity
+        self.max_gap = max_gap_days * 86400
+        self.values = np.zeros((len(self.symbols), 2 * capacity))
+        self.counts = np.zeros(len(self.symbols), dtype=int)
+        self.heads = np.zeros(len(self.symbols), dtype=int)
+        # Last bar time per row in epoch seconds, and a one-slice cache of the datetime64
+        # conversion, which dominates the cost of an update otherwise
+        self.last = [None] * len(self.symbols)
+        self.cached_time = None
+        self.cached_stamp = None
+
+    def stamp(self, time):
+        if self.cached_time is None or time != self.cached_time:
+            self.cached_time = time
+            self.cached_stamp = int(np.datetime64(time, "s").astype(np.int64))
+        return self.cached_stamp
+
+    def update(self, symbol, time, value):
+        # Returns the gap in days when the bar arrives more than max_gap_days after the last one
+        row = self.rows[symbol]
+        stamp = self.stamp(time)
+        last = self.last[row]
+        gap = None
+        if last is not None:
+            if stamp <= last:
+                return None
+            if stamp - last > self.max_gap:
+                gap = (stamp - last) // 86400
+        self.last[row] = stamp
+        head = self.heads[row]
+        self.values[row, head] = self.values[row, head + self.capacity] = value
+        self.heads[row] = (head + 1) % self.capacity
+        self.counts[row] = min(self.counts[row] + 1, self.capacity)
+        return gap
+
+    def window(self, symbol, length=None):
+        row = self.rows[symbol]
+        count = self.counts[row] if length is None else min(length, self.counts[row])
+        end = self.heads[row] + self.capacity
+        window = self.values[row, end - count:end]
+        window.flags.writeable = False
+        return window
+
+    def latest(self, symbol, default=0):
+        row = self.rows[symbol]
+        return self.values[row, self.heads[row] + self.capacity - 1] if self.counts[row] else default
+
+    def __len__(self):
+        return len(self.symbols)
+
+
+class DailyConsolidator:
+    # Daily closes streamed out of intraday (minute or hour) bars: the latest value of every
+    # symbol on the current calendar day, emitted as that day's bar, stamped at its midnight,
+    # when the first bar of a later day arrives. It holds one value per symbol, whatever the
+    # resolution.
+    def __init__(self):
+        self.day = None
+        self.closes = {}
+
+    def update(self, time, values):
+        # Returns (day, closes) when `time` starts a new day, None otherwise
+        day = time.date()
+        completed = None
+        if day != self.day:
+            completed = self.flush()
+            self.day = day
+        self.closes.update(values)
+        return completed
+
+    def flush(self):
+        # The current day's bar so far, or None before any bar
+        if self.day is None or not self.closes:
+            return None
+        completed = (datetime.combine(self.day, datetime.min.time()), self.closes)
+        self.closes = {}
+        return completed
@@ -0,0 +1,250 @@
+import os
+import time as clock
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from benchmarks import quantconnect
+from benchmarks.synthetic import generate_intraday, generate_market
+from columnar import write_columnar
+from journal import Journal
+from forex import ForexBasket
+from ingestion import IngestionPipeline
+from local_store import LocalObjectStore
+from pairs import PairsEngine
+from replay import ReplayEngine, SimulatedBroker, SYMBOLS
+from robustness import RobustnessEngine
+from strategy import MultiPMStrategy, TRADE_LOG_COLUMNS
+from training_cache import TrainingCache
+from training import TrainingFeatures, simulate_grid
+
+# Each case takes its parameters as keyword arguments and returns a dict of metrics. Metrics
+# ending in `_per_sec` are better when higher, every other metric when lower. Backtests start
+# after HISTORY_YEARS of synthetic data so warm-up and the RunTraining History calls are covered.
+HISTORY_YEARS = 4
+DATA_START = "2014-01-01"
+SEED = 7
+
+
+def backtest_window(years):
+    start = pd.Timestamp(DATA_START) + pd.DateOffset(years=HISTORY_YEARS)
+    return start.to_pydatetime(), (start + pd.DateOffset(years=years)).to_pydatetime()
+
+
+def store_bytes(store, exclude=(".pmcol",)):
+    return sum(os.path.getsize(store.GetFilePath(key)) for key in store.Keys if not key.endswith(exclude))
+
+
+def percentiles(nanoseconds):
+    p50, p99 = np.percentile(nanoseconds, [50, 99]) / 1e3 if len(nanoseconds) else (np.nan, np.nan)
+    return {"p50_us": float(p50), "p99_us": float(p99), "max_us": float(nanoseconds.max() / 1e3) if len(nanoseconds) else np.nan}
+
+
+def ondata(years):
+    # main.MultiPMTradingAlgorithm end to end through the QuantConnect stand-in
+    quantconnect.install()
+    import main
+    asset_data, economic_data = generate_market(years + HISTORY_YEARS, seed=SEED, start=DATA_START)
+    start_date, end_date = backtest_window(years)
+    standin = quantconnect.LeanStandIn(asset_data, economic_data, start_date=start_date, end_date=end_date)
+    started = clock.perf_counter()
+    algorithm = standin.run(main.MultiPMTradingAlgorithm)
+    elapsed = clock.perf_counter() - started
+    bars = len(standin.latencies)
+    return dict(percentiles(standin.latencies), bars=bars, bars_per_sec=bars / elapsed, run_seconds=elapsed,
+                journal_rows=len(algorithm.allocation_history) + len(algorithm.trade_log),
+                journal_kb=store_bytes(standin.object_store) / 1024)
+
+
+def replay(years, metrics=False):
+    # The offline replay engine over the same data, without the API stand-in in between; with
+    # `metrics` the strategy's stage timers run too and their mean latencies are reported
+    asset_data, economic_data = generate_market(years + HISTORY_YEARS, seed=SEED, start=DATA_START)
+    start_date, end_date = backtest_window(years)
+    result = ReplayEngine(asset_data, economic_data, start_date, end_date, metrics=metrics).run()
+    stages = {f"{stage}_mean_us": stats["mean_us"] for stage, stats in result.metrics["stages"].items()} if metrics else {}
+    return dict({"bars": len(result.equity), "bars_per_sec": len(result.equity) / result.elapsed, "run_seconds": result.elapsed}, **stages)
+
+
+def intraday(years, bars_per_day=390):
+    # The replay at minute (390 bars a day) or hour (7) resolution over the same window: the
+    # intraday closes are written to a .pmcol file and streamed from its memory map, with the
+    # strategy consolidating them into daily bars and running its stops on every bar
+    asset_data, economic_data = generate_market(years + HISTORY_YEARS, seed=SEED, start=DATA_START)
+    start_date, end_date = backtest_window(years)
+    warmup = asset_data.index[max(0, asset_data.index.searchsorted(start_date) - 60)]
+    store = LocalObjectStore()
+    path = store.GetFilePath("intraday.pmcol")
+    write_columnar(generate_intraday(asset_data.loc[warmup:end_date], bars_per_day, 390 // bars_per_day, seed=SEED), path)
+    result = ReplayEngine(asset_data, economic_data, start_date, end_date, intraday_data=path, metrics=True).run()
+    stages = result.metrics["stages"]
+    bars = stages["on_data"]["count"] + stages["stops"]["count"]
+    return {"bars": bars, "bars_per_sec": bars / result.elapsed, "run_seconds": result.elapsed,
+            "stops_mean_us": stages["stops"]["mean_us"], "on_data_mean_us": stages["on_data"]["mean_us"]}
+
+
+def robustness(paths, method="block", years=5, workers=0):
+    # RobustnessEngine over the sleeve returns of a replay: `paths` resampled paths x days
+    asset_data, economic_data = generate_market(years + HISTORY_YEARS, seed=SEED, start=DATA_START)
+    start_date, end_date = backtest_window(years)
+    engine = RobustnessEngine.from_replay(ReplayEngine(asset_data, economic_data, start_date, end_date).run())
+    started = clock.perf_counter()
+    engine.run(paths, method, workers=workers)
+    elapsed = clock.perf_counter() - started
+    return {"days": len(engine.dates), "paths_per_sec": paths / elapsed, "run_seconds": elapsed}
+
+
+def training(years, grid):
+    # TrainingFeatures plus simulate_grid over a grid x grid (z_score_entry, momentum_threshold) grid
+    asset_data, economic_data = generate_market(years + 1, seed=SEED, start=DATA_START)
+    started = clock.perf_counter()
+    features = TrainingFeatures.from_series(asset_data["EURUSD"], economic_data["VIX"], asset_data["NVDA"], asset_data["AMD"], 15)
+    days = features.days(asset_data.index[0] + pd.DateOffset(months=6), asset_data.index[-1])
+    features_seconds = clock.perf_counter() - started
+    z_score_entries, momentum_thresholds = np.meshgrid(np.linspace(0.6, 1.6, grid), np.linspace(0.00003, 0.00011, grid))
+    started = clock.perf_counter()
+    simulate_grid(days, z_score_entries.ravel(), momentum_thresholds.ravel(), 1.5, 0.03, forex_weight=0.6, pair_weight=0.9, vol_limit=0.03)
+    grid_seconds = clock.perf_counter() - started
+    return {"days": len(days), "combinations": grid * grid, "features_seconds": features_seconds, "training_seconds": grid_seconds,
+            "combinations_per_sec": grid * grid / grid_seconds}
+
+
+def training_cache(years, runs=5):
+    # MultiPMStrategy.run_training over `years` of history: the first run simulates the grid and
+    # fills a file-backed TrainingCache, the rest load it
+    asset_data, economic_data = generate_market(years + 1, seed=SEED, start=DATA_START)
+    series = [asset_data["EURUSD"].dropna(), economic_data["VIX"].dropna(), asset_data["NVDA"].dropna(), asset_data["AMD"].dropna()]
+    start_date, end_date = (asset_data.index[0] + pd.DateOffset(months=6)).to_pydatetime(), asset_data.index[-1].to_pydatetime()
+    cache = TrainingCache(LocalObjectStore())
+    latencies = np.zeros(runs, dtype=np.int64)
+    for i in range(runs):
+        strategy = MultiPMStrategy(SimulatedBroker(), SYMBOLS, end_date, None, None, training_cache=cache)
+        strategy.build_regimes(economic_data.index.to_numpy(), economic_data["VIX"].to_numpy())
+        tick = clock.perf_counter_ns()
+        strategy.run_training(start_date, end_date, *series)
+        latencies[i] = clock.perf_counter_ns() - tick
+    return {"miss_ms": latencies[0] / 1e6, "hit_ms": float(np.median(latencies[1:])) / 1e6, "store_kb": store_bytes(cache.object_store) / 1024}
+
+
+def ingestion(years, days=5, refreshes=5):
+    # IngestionPipeline against the file-backed QuantBook: a build of `years` of history, then
+    # `refreshes` refreshes of `days` new business days each
+    asset_data, economic_data = generate_market(years + 1, seed=SEED, start=DATA_START)
+    root = LocalObjectStore().root
+    quantconnect.write_history(root, asset_data, economic_data)
+    quantconnect.install()
+    pipeline = IngestionPipeline(quantconnect.QuantBook(root, LocalObjectStore()), start_date=asset_data.index[0].to_pydatetime())
+    ends = asset_data.index[-1 - days * refreshes::days]
+    started = clock.perf_counter()
+    pipeline.refresh_all(ends[0].to_pydatetime())
+    build_seconds = clock.perf_counter() - started
+    latencies = np.zeros(refreshes, dtype=np.int64)
+    for i, end in enumerate(ends[1:]):
+        tick = clock.perf_counter_ns()
+        pipeline.refresh_all(end.to_pydatetime())
+        latencies[i] = clock.perf_counter_ns() - tick
+    return {"build_seconds": build_seconds, "refresh_ms": float(np.median(latencies)) / 1e6, "store_kb": store_bytes(pipeline.object_store, ()) / 1024}
+
+
+def journal(rows, flush_rows=20):
+    # Trade_Log-shaped appends, flushed to a file-backed ObjectStore, then compacted
+    store = LocalObjectStore()
+    log = Journal(store, "Trade_Log", TRADE_LOG_COLUMNS, flush_rows=flush_rows)
+    time = datetime(2020, 1, 1)
+    latencies = np.zeros(rows, dtype=np.int64)
+    started = clock.perf_counter()
+    for i in range(rows):
+        tick = clock.perf_counter_ns()
+        log.append({"Date": time, "Event": f"Equity reset: {100000 + i}"})
+        latencies[i] = clock.perf_counter_ns() - tick
+    append_seconds = clock.perf_counter() - started
+    started = clock.perf_counter()
+    log.compact()
+    return dict(percentiles(latencies), appends_per_sec=rows / append_seconds, compact_seconds=clock.perf_counter() - started,
+                store_kb=store_bytes(store) / 1024)
+
+
+def pairs(symbols, days=252):
+    # PairsEngine over a synthetic universe: a bar per day, a screen of every pair each week and
+    # the exit/entry rules over the open and screened pairs on every bar
+    asset_data, _ = generate_market(days / 252 + 0.5, symbols, seed=SEED, start=DATA_START)
+    closes = asset_data.to_numpy()
+    engine = PairsEngine(asset_data.columns, max_pairs=10)
+    for row in closes[:-days]:
+        engine.update(row)
+    screens = []
+    latencies = np.zeros(days, dtype=np.int64)
+    started = clock.perf_counter()
+    for i, row in enumerate(closes[-days:]):
+        tick = clock.perf_counter_ns()
+        engine.update(row)
+        if engine.due:
+            screen_tick = clock.perf_counter_ns()
+            engine.screen()
+            screens.append(clock.perf_counter_ns() - screen_tick)
+        active, first, second = engine.active()
+        spread, z_score, ready = engine.statistics(first, second)
+        engine.exits(active, z_score, row[first], row[second], 0.03)
+        engine.entries(active, z_score, spread, row[first], row[second], 1.0)
+        latencies[i] = clock.perf_counter_ns() - tick
+    elapsed = clock.perf_counter() - started
+    return dict(percentiles(latencies), combinations=len(engine.first), bars_per_sec=days / elapsed,
+                screen_ms=float(np.median(screens)) / 1e6)
+
+
+def forex(symbols, days=252):
+    # ForexBasket signal evaluation per bar over `symbols` synthetic series: the indicator
+    # updates, then indicators, stop checks and entries for the whole basket
+    asset_data, _ = generate_market(days / 252 + 0.5, symbols, seed=SEED, start=DATA_START)
+    names = list(asset_data.columns)
+    closes = asset_data.to_numpy()
+    basket = ForexBasket(names, 15)
+    updated = set(names)
+    for row in closes[:-days]:
+        basket.update(updated, dict(zip(names, row)))
+    latencies = np.zeros(days, dtype=np.int64)
+    started = clock.perf_counter()
+    for i, row in enumerate(closes[-days:]):
+        values = dict(zip(names, row))
+        tick = clock.perf_counter_ns()
+        basket.update(updated, values)
+        momentum, sma_short, sma_long, atr, vol = basket.indicators()
+        basket.stops(row, 1.5 * atr)
+        basket.enter((basket.direction == 0) & (np.abs(momentum) > 0.00007) & (vol < 0.5)
+                     & np.where(momentum > 0, sma_short > sma_long, sma_short < sma_long), momentum, row)
+        latencies[i] = clock.perf_counter_ns() - tick
+    return dict(percentiles(latencies), bars_per_sec=days / (clock.perf_counter() - started))
+
+
+def generator(years, symbols):
+    started = clock.perf_counter()
+    asset_data, economic_data = generate_market(years, symbols, seed=SEED, start=DATA_START)
+    return {"generate_seconds": clock.perf_counter() - started, "frame_mb": (asset_data.memory_usage().sum() + economic_data.memory_usage().sum()) / 2 ** 20}
+
+
+CASES = {
+    "ondata": (ondata, [{"years": 2}, {"years": 5}, {"years": 10}]),
+    "replay": (replay, [{"years": 2}, {"years": 5}, {"years": 10}, {"years": 5, "metrics": True}]),
+    "intraday": (intraday, [{"years": 2, "bars_per_day": 7}, {"years": 1}, {"years": 2}]),
+    "training": (training, [{"years": 2, "grid": 3}, {"years": 5, "grid": 3}, {"years": 10, "grid": 3},
+                            {"years": 5, "grid": 9}, {"years": 5, "grid": 27}]),
+    "training_cache": (training_cache, [{"years": 2}, {"years": 5}]),
+    "robustness": (robustness, [{"paths": 1000}, {"paths": 10000}, {"paths": 10000, "method": "regime"}, {"paths": 10000, "workers": 4}]),
+    "ingestion": (ingestion, [{"years": 2}, {"years": 10}, {"years": 10, "days": 21}]),
+    "journal": (journal, [{"rows": 1000}, {"rows": 10000}, {"rows": 100000}]),
+    "generator": (generator, [{"years": 10, "symbols": 5}, {"years": 10, "symbols": 50}, {"years": 10, "symbols": 500}]),
+    "pairs": (pairs, [{"symbols": 2}, {"symbols": 50}, {"symbols": 200}, {"symbols": 500}]),
+    "forex": (forex, [{"symbols": 1}, {"symbols": 8}, {"symbols": 50}]),
+}
+QUICK = {
+    "ondata": [{"years": 2}],
+    "replay": [{"years": 2}, {"years": 2, "metrics": True}],
+    "intraday": [{"years": 1, "bars_per_day": 7}],
+    "training": [{"years": 2, "grid": 3}, {"years": 2, "grid": 9}],
+    "training_cache": [{"years": 2}],
+    "robustness": [{"paths": 1000}],
+    "ingestion": [{"years": 2}],
+    "journal": [{"rows": 1000}],
+    "generator": [{"years": 2, "symbols": 5}, {"years": 2, "symbols": 50}],
+    "pairs": [{"symbols": 50}],
+    "forex": [{"symbols": 8}],
+}
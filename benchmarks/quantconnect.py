@@ -0,0 +1,356 @@
+import os
+import sys
+import time as clock
+import types
+from array import array
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from columnar import COLUMNAR_SUFFIX, ColumnarFrame, columnar_bytes, write_columnar
+from local_store import LocalObjectStore
+from replay import SimulatedBroker, FOREX, NVDA, VIX, bar_stream, load_frame
+
+# Offline stand-in for the slice of the QuantConnect API that main.py touches. Prices come from
+# asset_data / economic_data frames, accounting from replay.SimulatedBroker, and the ObjectStore
+# is a LocalObjectStore seeded with the columnar copies the notebooks publish.
+FRED_TICKERS = {"VIXCLS": VIX}
+
+
+class Resolution:
+    Minute = "Minute"
+    Hour = "Hour"
+    Daily = "Daily"
+
+
+class Market:
+    FXCM = "FXCM"
+    USA = "USA"
+
+
+class Fred:
+    pass
+
+
+class DayOfWeek:
+    Monday, Tuesday, Wednesday, Thursday, Friday, Saturday, Sunday = range(7)
+
+
+class Security:
+    def __init__(self, symbol, broker):
+        self.Symbol = symbol
+        self.broker = broker
+
+    @property
+    def Price(self):
+        return self.broker.price(self.Symbol)
+
+
+class Holding:
+    def __init__(self, symbol, broker):
+        self.symbol = symbol
+        self.broker = broker
+
+    @property
+    def Invested(self):
+        return self.broker.invested(self.symbol)
+
+    @property
+    def Quantity(self):
+        return self.broker.quantities.get(self.symbol, 0)
+
+    @property
+    def HoldingsValue(self):
+        return self.broker.holding_value(self.symbol)
+
+
+class Portfolio:
+    def __init__(self, broker):
+        self.broker = broker
+
+    @property
+    def TotalPortfolioValue(self):
+        return self.broker.portfolio_value()
+
+    @property
+    def MarginRemaining(self):
+        return self.broker.margin_remaining()
+
+    @property
+    def Cash(self):
+        return self.broker.cash
+
+    def __getitem__(self, symbol):
+        return Holding(symbol, self.broker)
+
+
+class Bar:
+    __slots__ = ("Symbol", "EndTime", "Value")
+
+    def __init__(self, symbol, end_time, value):
+        self.Symbol = symbol
+        self.EndTime = end_time
+        self.Value = value
+
+    @property
+    def Close(self):
+        return self.Value
+
+    @property
+    def Price(self):
+        return self.Value
+
+
+class Slice:
+    def __init__(self, time, bars):
+        self.Time = time
+        self.bars = bars
+
+    def ContainsKey(self, symbol):
+        return symbol in self.bars
+
+    def __getitem__(self, symbol):
+        return self.bars[symbol]
+
+    def __contains__(self, symbol):
+        return symbol in self.bars
+
+    @property
+    def Bars(self):
+        return self.bars
+
+
+class DateRules:
+    @staticmethod
+    def EveryDay():
+        return None
+
+    @staticmethod
+    def Every(day):
+        return day
+
+
+class TimeRules:
+    @staticmethod
+    def At(hour, minute):
+        return timedelta(hours=hour, minutes=minute)
+
+
+class Schedule:
+    def __init__(self):
+        self.events = []
+
+    def On(self, date_rule, time_rule, callback):
+        # date_rule is None for every day, otherwise a DayOfWeek
+        self.events.append((date_rule, time_rule, callback))
+
+
+class QCAlgorithm:
+    def __init__(self):
+        self.broker = SimulatedBroker()
+        self.Securities = {}
+        self.Portfolio = Portfolio(self.broker)
+        self.Schedule = Schedule()
+        self.DateRules = DateRules()
+        self.TimeRules = TimeRules()
+        self.ObjectStore = None
+        self.Time = datetime(1998, 1, 1)
+        self.StartDate = self.Time
+        self.EndDate = datetime.now()
+        self.IsWarmingUp = False
+        self.warmup_bars = 0
+        self.parameters = {}
+        self.date_overrides = (None, None)
+        self.data = {}
+        self.debug_messages = 0
+
+    def SetStartDate(self, year, month=None, day=None):
+        self.StartDate = self.date_overrides[0] or (year if isinstance(year, datetime) else datetime(year, month, day))
+        self.Time = self.StartDate
+
+    def SetEndDate(self, year, month=None, day=None):
+        self.EndDate = self.date_overrides[1] or (year if isinstance(year, datetime) else datetime(year, month, day))
+
+    def SetCash(self, cash):
+        self.broker.cash = float(cash)
+
+    def SetWarmup(self, bars, resolution=None):
+        self.warmup_bars = bars
+
+    def add(self, ticker, like=NVDA):
+        symbol = FRED_TICKERS.get(ticker, ticker)
+        self.Securities[symbol] = Security(symbol, self.broker)
+        if symbol != VIX and symbol not in self.broker.quantities:
+            # Subscriptions past the default five (a pairs universe, a forex basket) are margined
+            # and lotted like the default symbol of their asset class
+            self.broker.quantities[symbol] = 0.0
+            self.broker.leverage.setdefault(symbol, self.broker.leverage[like])
+            self.broker.lot_size.setdefault(symbol, self.broker.lot_size[like])
+        return self.Securities[symbol]
+
+    def AddForex(self, ticker, resolution=None, market=None):
+        return self.add(ticker, FOREX)
+
+    def AddEquity(self, ticker, resolution=None, market=None):
+        return self.add(ticker)
+
+    def AddData(self, data_type, ticker, resolution=None):
+        return self.add(ticker)
+
+    def GetParameter(self, name, default=None):
+        return self.parameters.get(name, default)
+
+    def Debug(self, message):
+        self.debug_messages += 1
+
+    def Log(self, message):
+        self.debug_messages += 1
+
+    def SetHoldings(self, symbol, weight):
+        self.broker.set_holdings(symbol, weight)
+
+    def Liquidate(self, symbol=None):
+        self.broker.liquidate(symbol)
+
+    def History(self, symbols, count, resolution=None):
+        # The last `count` bars of each symbol strictly before the current time, shaped like
+        # LEAN's (symbol, time)-indexed history frame with a close (or FRED value) column
+        symbols = symbols if isinstance(symbols, list) else [symbols]
+        end = np.datetime64(pd.Timestamp(self.Time))
+        frames = []
+        for symbol in symbols:
+            series = self.data.get(symbol)
+            if series is None:
+                continue
+            series = series[series.index < end].iloc[-count:]
+            frame = pd.DataFrame({"value" if symbol == VIX else "close": series.to_numpy()},
+                                 index=pd.MultiIndex.from_arrays([[symbol] * len(series), series.index], names=["symbol", "time"]))
+            frames.append(frame)
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames)
+
+    def OnEndOfAlgorithm(self):
+        pass
+
+
+class LeanStandIn:
+    # Runs a QCAlgorithm subclass over asset_data / economic_data the way LEAN would: Initialize,
+    # `SetWarmup` bars with IsWarmingUp set, then per data date the midnight scheduled events for
+    # every calendar day since the last one, the price update and OnData. Per-bar OnData latency
+    # is recorded in nanoseconds. start_date / end_date override the algorithm's own SetStartDate
+    # and SetEndDate calls. With `intraday_data` (minute or hour closes) the slices come from it,
+    # VIX still daily, while History keeps serving daily bars.
+    def __init__(self, asset_data, economic_data, object_store=None, parameters=None, start_date=None, end_date=None, intraday_data=None):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.assets = load_frame(asset_data)
+        self.economic = load_frame(economic_data)
+        self.intraday = load_frame(intraday_data) if intraday_data is not None else None
+        self.object_store = object_store or LocalObjectStore()
+        self.parameters = parameters or {}
+        self.object_store.SaveBytes("Asset_Data.pmcol", columnar_bytes(self.assets.to_frame()))
+        self.object_store.SaveBytes("Economic_Indicators.pmcol", columnar_bytes(self.economic.to_frame()))
+        self.latencies = np.zeros(0, dtype=np.int64)
+
+    def run(self, algorithm_class):
+        algorithm = algorithm_class()
+        algorithm.ObjectStore = self.object_store
+        algorithm.parameters = self.parameters
+        algorithm.date_overrides = (self.start_date, self.end_date)
+        algorithm.data = {name: frame.series(name).dropna() for frame, names in [(self.assets, self.assets.columns), (self.economic, [VIX])]
+                          for name in names if name in frame.columns}
+        algorithm.Initialize()
+        symbols = [symbol for symbol in algorithm.Securities if symbol in algorithm.data]
+        stream = bar_stream(self.assets, self.economic, symbols, algorithm.StartDate, algorithm.EndDate, algorithm.warmup_bars, self.intraday)
+        latencies = array("q")
+        last_day = None
+        for time, row in stream:
+            live = time >= algorithm.StartDate
+            algorithm.IsWarmingUp = not live
+            if live:
+                day = time.date()
+                calendar_day = last_day + timedelta(days=1) if last_day is not None else day
+                while calendar_day <= day:
+                    for date_rule, time_rule, callback in algorithm.Schedule.events:
+                        if date_rule is None or date_rule == calendar_day.weekday():
+                            algorithm.Time = datetime.combine(calendar_day, datetime.min.time()) + time_rule
+                            callback()
+                    calendar_day += timedelta(days=1)
+                last_day = day
+            present = {symbol: value for symbol, value in zip(symbols, row) if value == value}
+            algorithm.broker.mark(time, present)
+            algorithm.Time = time
+            data = Slice(time, {symbol: Bar(symbol, time, value) for symbol, value in present.items()})
+            started = clock.perf_counter_ns()
+            algorithm.OnData(data)
+            if live:
+                latencies.append(clock.perf_counter_ns() - started)
+        algorithm.IsWarmingUp = False
+        algorithm.OnEndOfAlgorithm()
+        self.latencies = np.frombuffer(latencies, dtype=np.int64)
+        return algorithm
+
+
+class QuantBook:
+    # Research-environment stand-in for ingestion.py: a subscription's daily history is the file
+    # `<root>/<ticker>.pmcol` (or `.csv`) with a Date index and one close, or FRED value, column,
+    # and History slices it by date, so a fetch reads only the rows it returns
+    def __init__(self, root, object_store=None):
+        self.root = root
+        self.ObjectStore = object_store if object_store is not None else LocalObjectStore()
+        self.files = {}
+
+    def add(self, ticker):
+        if ticker not in self.files:
+            path = os.path.join(self.root, ticker + COLUMNAR_SUFFIX)
+            if os.path.exists(path):
+                self.files[ticker] = ColumnarFrame.open(path)
+            else:
+                self.files[ticker] = ColumnarFrame.from_frame(pd.read_csv(os.path.join(self.root, ticker + ".csv"), parse_dates=[0], index_col=0))
+        return Security(ticker, None)
+
+    def AddForex(self, ticker, resolution=None, market=None):
+        return self.add(ticker)
+
+    def AddEquity(self, ticker, resolution=None, market=None):
+        return self.add(ticker)
+
+    def AddData(self, data_type, ticker, resolution=None):
+        return self.add(ticker)
+
+    def History(self, symbols, start, end, resolution=None):
+        frames = []
+        for symbol in symbols:
+            self.add(symbol)
+            data = self.files[symbol]
+            field = data.columns[0]
+            dates = data.date_range(start, end)
+            frames.append(pd.DataFrame({field: data.column(field, start, end)},
+                                       index=pd.MultiIndex.from_arrays([[symbol] * len(dates), dates], names=["symbol", "time"])))
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames)
+
+
+def write_history(root, asset_data, economic_data):
+    # One QuantBook history file per subscription in ingestion.DATASETS from asset_data /
+    # economic_data frames; the SPY closes behind Stock_Market are rebuilt from its returns
+    from ingestion import DATASETS
+    os.makedirs(root, exist_ok=True)
+    frames = {"Asset_Data": asset_data, "Economic_Indicators": economic_data}
+    for key, spec in DATASETS.items():
+        for column, (kind, ticker) in spec["columns"].items():
+            series = frames[key][column].dropna()
+            if column in spec["returns"]:
+                series = 100 * (1 + series).cumprod()
+            write_columnar(series.to_frame("value" if kind == "fred" else "close"), os.path.join(root, ticker + COLUMNAR_SUFFIX))
+
+
+def install():
+    # Registers the stand-in as the AlgorithmImports module so `import main` works offline
+    module = types.ModuleType("AlgorithmImports")
+    for name in ["QCAlgorithm", "QuantBook", "Resolution", "Market", "Fred", "DayOfWeek", "Slice", "Bar"]:
+        setattr(module, name, globals()[name])
+    module.__all__ = ["QCAlgorithm", "QuantBook", "Resolution", "Market", "Fred", "DayOfWeek", "Slice", "Bar"]
+    sys.modules["AlgorithmImports"] = module
+    return module
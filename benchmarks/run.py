@@ -0,0 +1,84 @@
+import argparse
+import json
+import resource
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from benchmarks.cases import CASES, QUICK
+
+# Runs every case in its own spawned process so peak RSS belongs to that case alone, prints one
+# row per case and parameter set, and optionally saves the results or checks them against a
+# saved baseline: python -m benchmarks.run [--quick] [--json out.json] [--compare base.json]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def best(metric, values):
+    return max(values) if metric.endswith("_per_sec") else min(values)
+
+
+def run_case(name, params, repeat=1):
+    # Keeps the best value of each metric over `repeat` runs, which damps scheduler noise
+    function = CASES[name][0]
+    baseline = peak_rss_mb()
+    runs = [function(**params) for _ in range(repeat)]
+    peak = peak_rss_mb()
+    metrics = {metric: best(metric, [run[metric] for run in runs]) for metric in runs[0]}
+    return dict(metrics, peak_rss_mb=peak, rss_growth_mb=peak - baseline)
+
+
+def case_id(name, params):
+    return name + "[" + ",".join(f"{key}={value}" for key, value in params.items()) + "]"
+
+
+def regressions(results, baseline, tolerance):
+    # Metrics ending in `_per_sec` regress when they fall, everything else when it rises
+    found = []
+    for key, metrics in results.items():
+        for metric, value in metrics.items():
+            before = baseline.get(key, {}).get(metric)
+            if not before or metric in ("bars", "days", "combinations", "journal_rows"):
+                continue
+            change = value / before - 1
+            if (change < -tolerance) if metric.endswith("_per_sec") else (change > tolerance):
+                found.append((key, metric, before, value, change))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline performance benchmarks for the Multi-PM strategy")
+    parser.add_argument("--quick", action="store_true", help="small parameter sets, for CI smoke runs")
+    parser.add_argument("--only", help="comma-separated case names: " + ",".join(CASES))
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the best value of each metric is reported")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="baseline results json to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative change before a metric counts as a regression")
+    args = parser.parse_args()
+    names = args.only.split(",") if args.only else list(CASES)
+    results = {}
+    context = get_context("spawn")
+    for name in names:
+        for params in (QUICK[name] if args.quick else CASES[name][1]):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                metrics = pool.submit(run_case, name, params, args.repeat).result()
+            key = case_id(name, params)
+            results[key] = metrics
+            print(key.ljust(36), "  ".join(f"{metric}={value:.4g}" for metric, value in metrics.items()), flush=True)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for key, metric, before, value, change in found:
+            print(f"REGRESSION {key} {metric}: {before:.4g} -> {value:.4g} ({change:+.1%})")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+# Annual drift, annual volatility and loading on the common equity factor of each traded
+# symbol. EURUSD is kept quiet enough for the forex sleeve's volatility filter to let trades
+# through, so the benchmarks exercise every branch of OnData.
+ASSETS = {
+    "EURUSD": (0.00, 0.025, 0.05),
+    "NVDA": (0.35, 0.50, 0.75),
+    "AMD": (0.30, 0.55, 0.70),
+    "IEF": (0.02, 0.07, -0.30),
+    "GLD": (0.05, 0.15, 0.05),
+}
+START_PRICES = {"EURUSD": 1.10, "NVDA": 25.0, "AMD": 10.0, "IEF": 105.0, "GLD": 120.0}
+# Extra FX pairs for a forex basket: start price and annual volatility, drawn from their own
+# random stream so asking for them leaves every other column unchanged
+FOREX_PAIRS = {"GBPUSD": (1.30, 0.03), "USDJPY": (110.0, 0.03), "AUDUSD": (0.75, 0.035), "USDCAD": (1.30, 0.025),
+               "USDCHF": (0.95, 0.03), "NZDUSD": (0.70, 0.035), "EURGBP": (0.85, 0.025), "EURJPY": (125.0, 0.035)}
+# Calm and stressed VIX regimes: long-run level, daily mean reversion, daily log volatility and
+# the chance of leaving the regime on any given day
+VIX_REGIMES = [(14.0, 0.05, 0.06, 0.01), (32.0, 0.10, 0.09, 0.05)]
+STRESS_VOL_MULTIPLIER = 2.0
+
+
+def vix_path(days, rng):
+    # Two-state Markov-switching, mean-reverting log VIX; returns the path and the state per day
+    state = np.empty(days, dtype=np.int8)
+    log_vix = np.empty(days)
+    current = 0
+    level = np.log(VIX_REGIMES[0][0])
+    switches = rng.random(days)
+    shocks = rng.standard_normal(days)
+    for t in range(days):
+        mean, speed, vol, leave = VIX_REGIMES[current]
+        if switches[t] < leave:
+            current = 1 - current
+            mean, speed, vol, leave = VIX_REGIMES[current]
+        level += speed * (np.log(mean) - level) + vol * shocks[t]
+        log_vix[t] = level
+        state[t] = current
+    return np.exp(log_vix), state
+
+
+def universe(symbols):
+    # The five strategy symbols first, then synthetic equities SYN0001... up to `symbols`
+    return list(ASSETS)[:symbols] + [f"SYN{i:04d}" for i in range(1, symbols - len(ASSETS) + 1)]
+
+
+def generate_market(years=10, symbols=5, seed=0, start="2014-01-01", forex_pairs=0):
+    # Deterministic correlated GBM closes on business days, a regime-switching VIX and the
+    # economic-indicator frame the notebooks export, as (asset_data, economic_data).
+    # `forex_pairs` appends that many of FOREX_PAIRS as driftless GBM columns.
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, periods=int(round(years * 252)), name="Date")
+    days = len(dates)
+    names = universe(symbols)
+    params = np.array([ASSETS.get(name, (rng.uniform(0.0, 0.3), rng.uniform(0.2, 0.6), rng.uniform(0.2, 0.9))) for name in names])
+    drift, vol, loading = params[:, 0] / 252, params[:, 1] / np.sqrt(252), params[:, 2]
+    vix, state = vix_path(days, rng)
+    stress = np.where(state == 1, STRESS_VOL_MULTIPLIER, 1.0)[:, None]
+    factor = rng.standard_normal((days, 1))
+    idiosyncratic = rng.standard_normal((days, len(names)))
+    shocks = loading * factor + np.sqrt(1 - loading ** 2) * idiosyncratic
+    log_returns = drift - 0.5 * (vol * stress) ** 2 + vol * stress * shocks
+    start_prices = np.array([START_PRICES.get(name, rng.uniform(10, 200)) for name in names])
+    closes = start_prices * np.exp(np.cumsum(log_returns, axis=0))
+    asset_data = pd.DataFrame(closes, index=dates, columns=names)
+    if forex_pairs:
+        fx_rng = np.random.default_rng([seed, 1])
+        for name, (start_price, annual_vol) in list(FOREX_PAIRS.items())[:forex_pairs]:
+            daily_vol = annual_vol / np.sqrt(252)
+            asset_data[name] = start_price * np.exp(np.cumsum(-0.5 * daily_vol ** 2 + daily_vol * fx_rng.standard_normal(days)))
+
+    # Quarterly GDP, monthly unemployment and CPI, daily rates, SPY returns and VIX, forward filled
+    quarter = pd.factorize(dates.to_period("Q"))[0]
+    month = pd.factorize(dates.to_period("M"))[0]
+    gdp = np.where(state == 1, -1.5, 2.5) + rng.normal(0, 1.0, days)
+    unemployment = 4.0 + np.cumsum(np.where(state == 1, 0.02, -0.005) + rng.normal(0, 0.01, days))
+    inflation = 240 * np.exp(np.cumsum(np.full(days, 0.025 / 252) + rng.normal(0, 0.0005, days)))
+    rates = np.clip(2.0 + np.cumsum(rng.normal(0, 0.03, days)), 0.1, None)
+    market = np.exp(0.6 * factor[:, 0] * 0.012 + rng.normal(0.0003, 0.006, days)) - 1
+    economic_data = pd.DataFrame({
+        "GDP_Growth": pd.Series(gdp, index=dates).groupby(quarter).transform("first").to_numpy(),
+        "Unemployment_Rate": pd.Series(unemployment, index=dates).groupby(month).transform("first").to_numpy(),
+        "Inflation": pd.Series(inflation, index=dates).groupby(month).transform("first").to_numpy(),
+        "Interest_Rates": rates,
+        "Stock_Market": market,
+        "VIX": vix,
+    }, index=dates)
+    economic_data.iloc[0, economic_data.columns.get_loc("Stock_Market")] = np.nan
+    return asset_data, economic_data
+
+
+def generate_intraday(asset_data, bars_per_day=390, minutes=1, seed=0, chunk_days=21):
+    # `bars_per_day` closes `minutes` apart from 09:30 on every date of asset_data, each day a
+    # Brownian bridge in log price from the previous close to that day's close at the daily
+    # return volatility, so the last bar of a day is its asset_data close. Days are bridged
+    # `chunk_days` at a time into one preallocated array.
+    rng = np.random.default_rng([seed, 2])
+    closes = np.log(asset_data.to_numpy(dtype=float))
+    previous = np.vstack([closes[:1], pd.DataFrame(closes).ffill().to_numpy()[:-1]])
+    vol = np.nan_to_num(np.nanstd(np.diff(closes, axis=0), axis=0), nan=0.01) / np.sqrt(bars_per_day)
+    steps = np.arange(1, bars_per_day + 1)[None, :, None] / bars_per_day
+    values = np.empty((len(closes), bars_per_day, closes.shape[1]))
+    for lo in range(0, len(closes), chunk_days):
+        hi = min(lo + chunk_days, len(closes))
+        walk = np.cumsum(rng.standard_normal((hi - lo, bars_per_day, closes.shape[1])) * vol, axis=1)
+        np.exp(previous[lo:hi, None] + steps * (closes[lo:hi] - previous[lo:hi])[:, None] + walk - steps * walk[:, -1:], out=values[lo:hi])
+    offsets = pd.to_timedelta(9 * 60 + 30 + minutes * np.arange(1, bars_per_day + 1), unit="min")
+    times = (asset_data.index.to_numpy()[:, None] + offsets.to_numpy()[None, :]).reshape(-1)
+    return pd.DataFrame(values.reshape(-1, closes.shape[1]), index=pd.DatetimeIndex(times, name="Date"), columns=asset_data.columns)
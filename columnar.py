@@ -0,0 +1,185 @@
+import json
+import struct
+from io import StringIO
+import numpy as np
+import pandas as pd
+
+# Layout: 8-byte magic, little-endian uint64 header length, JSON header, then one block per
+# column (the int64 date index first), every block starting on a 64-byte boundary so it can be
+# viewed in place from a memory map.
+MAGIC = b"PMCOL\x01\x00\x00"
+ALIGN = 64
+COLUMNAR_SUFFIX = ".pmcol"
+# Folder suffix of the chunks ingestion.py appends; `<key>` itself stays free for the CSV the
+# notebooks wrote, since LEAN saves keys as file paths and one name cannot be a file and a folder
+CHUNKS_SUFFIX = "_chunks"
+
+
+def aligned(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+def columnar_bytes(frame):
+    frame = frame.sort_index()
+    dates = pd.DatetimeIndex(frame.index).as_unit("ns").asi8
+    arrays = [("index", frame.index.name or "Date", dates)]
+    for name in frame.columns:
+        values = frame[name].to_numpy()
+        if values.dtype == object:
+            values = values.astype(float)
+        arrays.append(("column", str(name), np.ascontiguousarray(values)))
+    entries = []
+    offset = 0
+    for _, name, values in arrays:
+        entries.append({"name": name, "dtype": values.dtype.str, "offset": offset})
+        offset = aligned(offset + values.nbytes)
+    header = {"rows": len(frame), "index": entries[0], "columns": entries[1:]}
+    # Block offsets are stored relative to the data section, which starts after the header
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = aligned(len(MAGIC) + 8 + len(header_bytes))
+    out = bytearray(data_start + offset)
+    out[:len(MAGIC)] = MAGIC
+    out[len(MAGIC):len(MAGIC) + 8] = struct.pack("<Q", len(header_bytes))
+    out[len(MAGIC) + 8:len(MAGIC) + 8 + len(header_bytes)] = header_bytes
+    for entry, (_, _, values) in zip(entries, arrays):
+        start = data_start + entry["offset"]
+        out[start:start + values.nbytes] = values.tobytes()
+    return bytes(out)
+
+
+def write_columnar(frame, path):
+    with open(path, "wb") as f:
+        f.write(columnar_bytes(frame))
+
+
+class ColumnarFrame:
+    # Date-indexed columns backed by a memory map (or any buffer); slices are views found by
+    # binary search on the sorted int64 date column.
+    def __init__(self, dates, columns, index_name="Date"):
+        self.dates = dates
+        self.data = columns
+        self.index_name = index_name
+
+    @classmethod
+    def open(cls, path):
+        return cls.from_buffer(np.memmap(path, dtype=np.uint8, mode="r"))
+
+    @classmethod
+    def from_buffer(cls, buffer):
+        raw = np.frombuffer(buffer, dtype=np.uint8)
+        if bytes(raw[:len(MAGIC)]) != MAGIC:
+            raise ValueError("Not a columnar data file")
+        (header_length,) = struct.unpack("<Q", bytes(raw[len(MAGIC):len(MAGIC) + 8]))
+        header = json.loads(bytes(raw[len(MAGIC) + 8:len(MAGIC) + 8 + header_length]).decode("utf-8"))
+        data_start = aligned(len(MAGIC) + 8 + header_length)
+        rows = header["rows"]
+
+        def block(entry):
+            dtype = np.dtype(entry["dtype"])
+            start = data_start + entry["offset"]
+            return raw[start:start + rows * dtype.itemsize].view(dtype)
+
+        dates = block(header["index"]).view("datetime64[ns]")
+        columns = {entry["name"]: block(entry) for entry in header["columns"]}
+        return cls(dates, columns, header["index"]["name"])
+
+    @classmethod
+    def from_frame(cls, frame):
+        frame = frame.sort_index()
+        dates = pd.DatetimeIndex(frame.index).as_unit("ns").to_numpy()
+        return cls(dates, {str(name): frame[name].to_numpy() for name in frame.columns}, frame.index.name or "Date")
+
+    @property
+    def columns(self):
+        return list(self.data)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def rows(self, lo, hi):
+        # Rows lo..hi as views
+        return ColumnarFrame(self.dates[lo:hi], {name: values[lo:hi] for name, values in self.data.items()}, self.index_name)
+
+    def bounds(self, start=None, end=None):
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start)), side="left"))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end)), side="right"))
+        return lo, max(lo, hi)
+
+    def column(self, name, start=None, end=None):
+        lo, hi = self.bounds(start, end)
+        return self.data[name][lo:hi]
+
+    def date_range(self, start=None, end=None):
+        lo, hi = self.bounds(start, end)
+        return self.dates[lo:hi]
+
+    def series(self, name, start=None, end=None):
+        lo, hi = self.bounds(start, end)
+        return pd.Series(self.data[name][lo:hi], index=pd.DatetimeIndex(self.dates[lo:hi], name=self.index_name), name=name)
+
+    def to_frame(self, start=None, end=None):
+        lo, hi = self.bounds(start, end)
+        return pd.DataFrame({name: values[lo:hi] for name, values in self.data.items()},
+                            index=pd.DatetimeIndex(self.dates[lo:hi], name=self.index_name))
+
+
+class ChunkedFrame:
+    # The ColumnarFrame reads over ingestion.py's chunks, each kept memory-mapped: a read that
+    # falls inside one chunk is a view of it, and only reads spanning chunks copy the rows they
+    # cover. IngestionPipeline.compact folds the chunks into one.
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.index_name = chunks[0].index_name
+
+    @property
+    def columns(self):
+        return self.chunks[0].columns
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self.chunks)
+
+    @property
+    def dates(self):
+        return self.date_range()
+
+    def pieces(self, values, start, end):
+        # `values(chunk, lo, hi)` of every chunk overlapping start..end, joined
+        parts = []
+        for chunk in self.chunks:
+            lo, hi = chunk.bounds(start, end)
+            if hi > lo:
+                parts.append(values(chunk, lo, hi))
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else values(self.chunks[0], 0, 0)
+
+    def column(self, name, start=None, end=None):
+        return self.pieces(lambda chunk, lo, hi: chunk.data[name][lo:hi], start, end)
+
+    def date_range(self, start=None, end=None):
+        return self.pieces(lambda chunk, lo, hi: chunk.dates[lo:hi], start, end)
+
+    def series(self, name, start=None, end=None):
+        return pd.Series(self.column(name, start, end), index=pd.DatetimeIndex(self.date_range(start, end), name=self.index_name), name=name)
+
+    def to_frame(self, start=None, end=None):
+        return pd.DataFrame({name: self.column(name, start, end) for name in self.columns},
+                            index=pd.DatetimeIndex(self.date_range(start, end), name=self.index_name))
+
+
+def load_columnar(object_store, key):
+    # Prefers the chunks ingestion.py appends under `<key>_chunks/`, then the memory-mapped
+    # `<key>.pmcol` entry, and falls back to the CSV the notebooks wrote under `key`
+    manifest_key = f"{key}{CHUNKS_SUFFIX}/manifest"
+    if object_store.ContainsKey(manifest_key):
+        chunks = [ColumnarFrame.open(object_store.GetFilePath(f"{key}{CHUNKS_SUFFIX}/{n:06d}{COLUMNAR_SUFFIX}"))
+                  for n in range(json.loads(object_store.Read(manifest_key))["chunks"])]
+        if chunks:
+            return chunks[0] if len(chunks) == 1 else ChunkedFrame(chunks)
+    columnar_key = key + COLUMNAR_SUFFIX
+    if object_store.ContainsKey(columnar_key):
+        return ColumnarFrame.open(object_store.GetFilePath(columnar_key))
+    text = object_store.Read(key) if object_store.ContainsKey(key) else None
+    if text:
+        return ColumnarFrame.from_frame(pd.read_csv(StringIO(text), parse_dates=["Date"], index_col="Date"))
+    return None
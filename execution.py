@@ -0,0 +1,75 @@
+import numpy as np
+from instrumentation import Instrumentation
+
+
+class ExecutionBatch:
+    # Collects the target weights every sleeve sets during one bar and places them together.
+    # Later targets for a symbol replace earlier ones, so an exit and a re-entry in the same bar
+    # net to a single order. On submit the whole vector is sized against one snapshot of
+    # portfolio value and remaining margin: margin is charged at each symbol's sleeve leverage
+    # (`leverage(symbol)`) and the positions being replaced give theirs back. If the new targets
+    # still need more than that, only the increases are scaled down, all by the same factor;
+    # closes, reductions and the part of a target already held are left as they are. Orders go
+    # out closes first, then reductions, then increases, so margin is freed before it is used.
+    def __init__(self, broker, leverage, buffer=0.95, metrics=None):
+        self.broker = broker
+        self.metrics = metrics or Instrumentation(broker.debug)
+        self.leverage = leverage
+        self.buffer = buffer
+        self.targets = {}
+        self.submitted = 0
+        self.scaled = 0
+
+    def target(self, symbol, weight):
+        self.targets[symbol] = weight
+
+    def liquidate(self, symbol):
+        self.targets[symbol] = 0
+
+    def cancel(self):
+        self.targets = {}
+
+    def __len__(self):
+        return len(self.targets)
+
+    def submit(self):
+        # Places the pending targets; returns the (symbol, weight) orders sent
+        if not self.targets:
+            return []
+        broker = self.broker
+        symbols = list(self.targets)
+        self.targets, targets = {}, np.array([self.targets[symbol] for symbol in symbols], dtype=float)
+        portfolio_value = broker.portfolio_value()
+        if portfolio_value <= 0:
+            return []
+        current = np.array([broker.holding_value(symbol) for symbol in symbols], dtype=float) / portfolio_value
+        leverage = np.array([self.leverage(symbol) for symbol in symbols], dtype=float)
+        required = (np.abs(targets) / leverage).sum() * portfolio_value
+        available = broker.margin_remaining() + (np.abs(current) / leverage).sum() * portfolio_value
+        if required > available:
+            # The held part of each target: all of a reduction, the current weight of a same-side
+            # increase, nothing of a flip
+            kept = np.where(targets * current > 0, np.sign(targets) * np.minimum(np.abs(targets), np.abs(current)), 0.0)
+            increases = (np.abs(targets - kept) / leverage).sum() * portfolio_value
+            if increases > 0:
+                kept_margin = (np.abs(kept) / leverage).sum() * portfolio_value
+                factor = min(max(available * self.buffer - kept_margin, 0.0) / increases, 1.0)
+                targets = kept + factor * (targets - kept)
+                self.scaled += 1
+                self.metrics.count("scaled_batches")
+                self.metrics.info("Target increases scaled by %.3f to fit buying power", factor)
+        # 0: closes, 1: reductions (or flips through zero), 2: increases; unchanged targets are skipped
+        stage = np.where(targets == 0, 0, np.where(np.abs(targets) < np.abs(current), 1, 2))
+        stage[(targets == current) | ((targets == 0) & (current == 0))] = -1
+        orders = []
+        for i in np.argsort(stage, kind="stable"):
+            if stage[i] < 0:
+                continue
+            if targets[i] == 0:
+                broker.liquidate(symbols[i])
+            else:
+                broker.set_holdings(symbols[i], float(targets[i]))
+            orders.append((symbols[i], float(targets[i])))
+        self.submitted += len(orders)
+        self.metrics.count("orders", len(orders))
+        return orders
@@ -0,0 +1,57 @@
+import numpy as np
+from streaming_indicators import StreamingBasket
+
+
+class ForexBasket:
+    # FX pairs of the forex sleeve. update() streams each new close into a StreamingBasket,
+    # which keeps momentum, SMA10/SMA20, range ATR and return volatility for the whole basket
+    # in arrays; indicators() reads them back. Position direction and entry price are arrays
+    # over the basket.
+    def __init__(self, symbols, lookback, short_period=10, long_period=20):
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.lookback = lookback
+        self.streams = StreamingBasket(len(self.symbols), lookback, lookback + 20, short_period, long_period)
+        # +1 long, -1 short, 0 flat
+        self.direction = np.zeros(len(self.symbols))
+        self.entry_price = np.full(len(self.symbols), np.nan)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def update(self, updated, values):
+        # Streams the close in `values` of every basket symbol in `updated`
+        rows = [i for i, symbol in enumerate(self.symbols) if symbol in updated]
+        if rows:
+            prices = np.array([values[self.symbols[i]] for i in rows], dtype=float)
+            self.streams.update(None if len(rows) == len(self.symbols) else np.array(rows, dtype=np.intp), prices)
+
+    def ready(self):
+        return self.streams.sample_counts() >= self.lookback
+
+    def indicators(self):
+        # (momentum, sma_short, sma_long, atr, vol) per symbol; NaN where a symbol lacks the bars
+        return self.streams.values()
+
+    def stops(self, price, stop_distance):
+        # Closes open positions whose price moved `stop_distance` (a fraction of the entry
+        # price) away from the entry; returns their indices
+        held = (self.direction != 0) & (self.entry_price != 0) & (price != 0)
+        if not held.any():
+            return np.flatnonzero(held)
+        moved = np.abs(price - self.entry_price)
+        stopped = np.flatnonzero(held & (np.divide(moved, self.entry_price, out=np.zeros_like(moved), where=held) >= stop_distance))
+        self.direction[stopped] = 0
+        self.entry_price[stopped] = np.nan
+        return stopped
+
+    def enter(self, signal, momentum, price):
+        # Opens a position in the direction of momentum wherever `signal` is set; returns the indices
+        opened = np.flatnonzero(signal)
+        self.direction[opened] = np.where(momentum[opened] > 0, 1.0, -1.0)
+        self.entry_price[opened] = price[opened]
+        return opened
+
+    def flatten(self):
+        # Positions closed outside the sleeve (drawdown liquidation); entry prices are left as they were
+        self.direction[:] = 0
@@ -0,0 +1,222 @@
+import argparse
+import json
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from columnar import CHUNKS_SUFFIX, COLUMNAR_SUFFIX, columnar_bytes, load_columnar, write_columnar
+
+START_DATE = datetime(2016, 1, 1)
+# Column -> (subscription, ticker), as assets_data.ipynb and economic_indicators_data.ipynb define them
+ASSETS = {
+    "EURUSD": ("forex", "EURUSD"),
+    "NVDA": ("equity", "NVDA"),
+    "AMD": ("equity", "AMD"),
+    "IEF": ("equity", "IEF"),
+    "GLD": ("equity", "GLD"),
+}
+INDICATORS = {
+    "GDP_Growth": ("fred", "A191RL1Q225SBEA"),  # Real GDP growth, quarterly
+    "Unemployment_Rate": ("fred", "UNRATE"),  # Unemployment rate, monthly
+    "Inflation": ("fred", "CPIAUCNS"),  # CPI, monthly
+    "Interest_Rates": ("fred", "DGS10"),  # 10-Year Treasury Yield, daily
+    "Stock_Market": ("equity", "SPY"),  # SPY returns as proxy
+    "VIX": ("fred", "VIXCLS"),  # VIX volatility index, daily
+}
+# ObjectStore key -> columns, how gaps are filled, columns stored as daily returns of their
+# closes, how far before the watermark to look for late observations (FRED publishes monthly
+# and quarterly values weeks after the date they carry) and the file name of local copies
+DATASETS = {
+    "Asset_Data": {"columns": ASSETS, "fill": "interpolate", "returns": [], "overlap_days": 0, "local": "asset_data"},
+    "Economic_Indicators": {"columns": INDICATORS, "fill": "ffill", "returns": ["Stock_Market"], "overlap_days": 120,
+                            "local": "economic_indicators_data"},
+}
+
+
+class IngestionPipeline:
+    # Incremental replacement for the notebooks' full refetch. Each dataset is stored as
+    # `<key>_chunks/<n>.pmcol` columnar chunks plus a `<key>_chunks/manifest` holding the
+    # watermark (last stored date) and the fill state of every column, which load_columnar reads
+    # back as one frame; the bare `<key>` keeps the notebooks' CSV. refresh() fetches History only
+    # after the watermark, fills the new rows from the stored state as a full rebuild would fill
+    # them, and appends them as one chunk; stored rows are never rewritten, so interpolated
+    # datasets hold back trailing rows some column has not reported yet. The chunk is saved before
+    # the manifest, so an interrupted refresh simply runs again. `qb` is a QuantBook (or
+    # benchmarks.quantconnect.QuantBook offline).
+    def __init__(self, qb, object_store=None, datasets=DATASETS, start_date=START_DATE):
+        self.qb = qb
+        self.object_store = object_store if object_store is not None else qb.ObjectStore
+        self.datasets = datasets
+        self.start_date = start_date
+        self.symbols = {}
+
+    def subscribe(self, key):
+        # Symbol and History field of every column, added to the QuantBook once
+        if key not in self.symbols:
+            from AlgorithmImports import Fred, Market, Resolution
+            symbols = {}
+            for column, (kind, ticker) in self.datasets[key]["columns"].items():
+                if kind == "forex":
+                    symbols[column] = (self.qb.AddForex(ticker, Resolution.Daily, Market.FXCM).Symbol, "close")
+                elif kind == "equity":
+                    symbols[column] = (self.qb.AddEquity(ticker, Resolution.Daily).Symbol, "close")
+                else:
+                    symbols[column] = (self.qb.AddData(Fred, ticker, Resolution.Daily).Symbol, "value")
+            self.symbols[key] = symbols
+        return self.symbols[key]
+
+    def chunk_key(self, key, n):
+        return f"{key}{CHUNKS_SUFFIX}/{n:06d}{COLUMNAR_SUFFIX}"
+
+    def manifest_key(self, key):
+        return f"{key}{CHUNKS_SUFFIX}/manifest"
+
+    def read_manifest(self, key):
+        if self.object_store.ContainsKey(self.manifest_key(key)):
+            return json.loads(self.object_store.Read(self.manifest_key(key)))
+        columns = list(self.datasets[key]["columns"])
+        # observed: latest real value per column and its date; since: rows stored after it
+        return {"columns": columns, "chunks": 0, "rows": 0, "watermark": None, "observed": dict.fromkeys(columns, np.nan),
+                "observed_dates": dict.fromkeys(columns), "since": dict.fromkeys(columns, 0), "closes": {}}
+
+    def fetch(self, key, start, end):
+        # Date-indexed raw observations of every column between start and end
+        symbols = self.subscribe(key)
+        history = self.qb.History([symbol for symbol, _ in symbols.values()], start, end, self.resolution())
+        observations = {}
+        for column, (symbol, field) in symbols.items():
+            if history.empty or symbol not in history.index.get_level_values(0) or field not in history.columns:
+                observations[column] = pd.Series(dtype=float, index=pd.DatetimeIndex([]))
+                continue
+            series = history.loc[symbol][field].dropna()
+            series.index = pd.to_datetime(series.index.date)
+            observations[column] = series[~series.index.duplicated(keep="last")].sort_index()
+        return observations
+
+    def resolution(self):
+        from AlgorithmImports import Resolution
+        return Resolution.Daily
+
+    def refresh(self, key, end=None):
+        # Appends the rows dated after the watermark up to `end` (now by default); returns how many
+        spec = self.datasets[key]
+        manifest = self.read_manifest(key)
+        columns = list(spec["columns"])
+        if manifest["columns"] != columns:
+            raise ValueError(f"{key} is stored with columns {manifest['columns']}, not {columns}; rebuild it")
+        watermark = pd.Timestamp(manifest["watermark"]) if manifest["watermark"] else None
+        start = self.start_date if watermark is None else watermark + timedelta(days=1 - spec["overlap_days"])
+        observations = self.fetch(key, start, end or datetime.now())
+        closes = manifest["closes"]
+        raw_closes = {}
+        for column in spec["returns"]:
+            # Returns over the column's own closes, continuing from the last stored close
+            series = observations[column]
+            if watermark is not None:
+                series = series[series.index > watermark]
+            raw_closes[column] = series
+            values = np.concatenate([[closes.get(column, np.nan)], series.to_numpy(dtype=float)])
+            observations[column] = pd.Series(values[1:] / values[:-1] - 1, index=series.index)
+        if spec["fill"] == "ffill" and watermark is not None:
+            # Late observations dated inside the stored range carry forward into the new rows
+            for column, series in observations.items():
+                late = series[series.index <= watermark]
+                observed_date = manifest["observed_dates"][column]
+                if len(late) and (observed_date is None or late.index[-1] > pd.Timestamp(observed_date)):
+                    manifest["observed"][column] = float(late.iloc[-1])
+                    manifest["observed_dates"][column] = late.index[-1].strftime("%Y-%m-%d")
+        new = {column: series[series.index > watermark] if watermark is not None else series for column, series in observations.items()}
+        dates = pd.DatetimeIndex(sorted(set().union(*[series.index for series in new.values()])), name="Date")
+        if not len(dates):
+            self.object_store.Save(self.manifest_key(key), json.dumps(manifest))
+            return 0
+        frame = pd.DataFrame({column: new[column].reindex(dates) for column in columns}, index=dates)
+        if spec["fill"] == "interpolate":
+            # Rows after the last one every column reports are held back for the next refresh,
+            # whose later observations they interpolate towards (kept if no row is complete)
+            complete = np.flatnonzero(frame.notna().all(axis=1).to_numpy())
+            if len(complete):
+                frame = frame.iloc[:complete[-1] + 1]
+                dates = frame.index
+        for column, series in raw_closes.items():
+            series = series[series.index <= dates[-1]]
+            if len(series):
+                closes[column] = float(series.iloc[-1])
+        filled = self.fill(frame, manifest, spec["fill"])
+        self.object_store.SaveBytes(self.chunk_key(key, manifest["chunks"]), columnar_bytes(filled))
+        for column in columns:
+            valid = np.flatnonzero(frame[column].notna().to_numpy())
+            if len(valid):
+                manifest["observed"][column] = float(frame[column].iloc[valid[-1]])
+                manifest["observed_dates"][column] = dates[valid[-1]].strftime("%Y-%m-%d")
+                manifest["since"][column] = len(dates) - 1 - int(valid[-1])
+            else:
+                manifest["since"][column] += len(dates)
+        manifest["chunks"] += 1
+        manifest["rows"] += len(dates)
+        manifest["watermark"] = dates[-1].strftime("%Y-%m-%d")
+        self.object_store.Save(self.manifest_key(key), json.dumps(manifest))
+        return len(dates)
+
+    def fill(self, frame, manifest, method):
+        # The notebooks' ffill / linear interpolate over the new rows, resumed from the stored
+        # state: each column is prefixed with its last real value and, for interpolation, the
+        # rows stored since, so the new rows come out as in a fill over the whole history
+        filled = {}
+        for column in frame.columns:
+            observed = manifest["observed"][column]
+            observed = np.nan if observed is None else observed
+            gap = manifest["since"][column] if method == "interpolate" and observed == observed else 0
+            values = np.concatenate([[observed], np.full(gap, np.nan), frame[column].to_numpy(dtype=float)])
+            series = pd.Series(values)
+            series = series.ffill() if method == "ffill" else series.interpolate()
+            filled[column] = series.to_numpy()[gap + 1:]
+        return pd.DataFrame(filled, index=frame.index)
+
+    def refresh_all(self, end=None):
+        return {key: self.refresh(key, end) for key in self.datasets}
+
+    def delete(self, key):
+        # Drops every chunk and the manifest, so the next refresh rebuilds from start_date
+        manifest = self.read_manifest(key)
+        for n in range(manifest["chunks"]):
+            if self.object_store.ContainsKey(self.chunk_key(key, n)):
+                self.object_store.Delete(self.chunk_key(key, n))
+        if self.object_store.ContainsKey(self.manifest_key(key)):
+            self.object_store.Delete(self.manifest_key(key))
+
+    def compact(self, key):
+        # Folds every chunk into one; the only step that rewrites stored rows
+        manifest = self.read_manifest(key)
+        if manifest["chunks"] <= 1:
+            return
+        frame = load_columnar(self.object_store, key).to_frame()
+        self.object_store.SaveBytes(self.chunk_key(key, 0), columnar_bytes(frame))
+        for n in range(1, manifest["chunks"]):
+            self.object_store.Delete(self.chunk_key(key, n))
+        manifest["chunks"] = 1
+        self.object_store.Save(self.manifest_key(key), json.dumps(manifest))
+
+
+if __name__ == "__main__":
+    from benchmarks.quantconnect import QuantBook, install
+    from local_store import LocalObjectStore
+    parser = argparse.ArgumentParser(description="Refresh Asset_Data and Economic_Indicators against the local QuantBook stand-in")
+    parser.add_argument("history_dir", help="directory of <ticker>.pmcol / <ticker>.csv daily history files")
+    parser.add_argument("store_dir", help="directory backing the ObjectStore the datasets are kept in")
+    parser.add_argument("--end", help="last date to ingest (default: today)")
+    parser.add_argument("--rebuild", action="store_true", help="drop the stored datasets and ingest from the start")
+    parser.add_argument("--compact", action="store_true", help="fold each dataset's chunks into one afterwards")
+    parser.add_argument("--export-dir", help="also write asset_data.pmcol / economic_indicators_data.pmcol here for replay.py")
+    args = parser.parse_args()
+    install()
+    pipeline = IngestionPipeline(QuantBook(args.history_dir, LocalObjectStore(args.store_dir)))
+    for key, spec in pipeline.datasets.items():
+        if args.rebuild:
+            pipeline.delete(key)
+        rows = pipeline.refresh(key, datetime.fromisoformat(args.end) if args.end else None)
+        if args.compact:
+            pipeline.compact(key)
+        manifest = pipeline.read_manifest(key)
+        print(f"{key}: {rows} rows appended, {manifest['rows']} rows in {manifest['chunks']} chunks up to {manifest['watermark']}")
+        if args.export_dir and manifest["rows"]:
+            write_columnar(load_columnar(pipeline.object_store, key).to_frame(), f"{args.export_dir}/{spec['local']}{COLUMNAR_SUFFIX}")
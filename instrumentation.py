@@ -0,0 +1,117 @@
+import json
+import time as clock
+
+DEBUG, INFO, WARNING, OFF = 10, 20, 30, 100
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "off": OFF}
+# Latency histograms split every power of two of nanoseconds into four buckets
+BUCKETS = 256
+
+
+def bucket(nanoseconds):
+    bits = nanoseconds.bit_length()
+    return nanoseconds if bits < 3 else 4 * bits - 8 + ((nanoseconds >> (bits - 3)) & 3)
+
+
+def bucket_limit(index):
+    # Exclusive upper bound, in nanoseconds, of a bucket
+    return index + 1 if index < 4 else (5 + index % 4) << (index // 4 - 1)
+
+
+class Instrumentation:
+    # Level-gated logging, per-stage latency histograms and counters for the hot path. Messages
+    # take %-style arguments that are only formatted when their level is enabled; callers whose
+    # arguments are themselves costly check is_enabled(level) first. Timers and counters are no-ops
+    # unless `enabled`, so a disabled instance costs one attribute test per call. Every
+    # `export_every` bars the snapshot is saved as JSON under `key` in `object_store` (the LEAN
+    # ObjectStore or a LocalObjectStore directory).
+    def __init__(self, sink, level="debug", enabled=False, object_store=None, key="Metrics", export_every=0):
+        self.sink = sink
+        self.level = LEVELS[level] if isinstance(level, str) else level
+        self.enabled = enabled
+        self.object_store = object_store
+        self.key = key
+        self.export_every = export_every
+        self.histograms = {}
+        self.totals = {}
+        self.maxima = {}
+        self.counters = {}
+        self.bars = 0
+
+    def is_enabled(self, level):
+        return level >= self.level
+
+    def debug(self, message, *args):
+        if DEBUG >= self.level:
+            self.sink(message % args if args else message)
+
+    def info(self, message, *args):
+        if INFO >= self.level:
+            self.sink(message % args if args else message)
+
+    def warning(self, message, *args):
+        if WARNING >= self.level:
+            self.sink(message % args if args else message)
+
+    def start(self):
+        return clock.perf_counter_ns() if self.enabled else 0
+
+    def stop(self, stage, started):
+        # Records the time since `started` (a start() value) against `stage`; returns a new start
+        if not self.enabled:
+            return 0
+        now = clock.perf_counter_ns()
+        elapsed = now - started
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = [0] * BUCKETS
+            self.totals[stage] = self.maxima[stage] = 0
+        histogram[min(bucket(elapsed), BUCKETS - 1)] += 1
+        self.totals[stage] += elapsed
+        if elapsed > self.maxima[stage]:
+            self.maxima[stage] = elapsed
+        return now
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def bar(self):
+        # Called once per bar; exports the snapshot every `export_every` bars
+        if not self.enabled:
+            return
+        self.bars += 1
+        if self.export_every and self.bars % self.export_every == 0:
+            self.export()
+
+    def percentile(self, stage, q):
+        # Upper bound, in microseconds, of the bucket holding the q-th percentile
+        histogram = self.histograms[stage]
+        rank = q / 100 * sum(histogram)
+        seen = 0
+        for index, count in enumerate(histogram):
+            seen += count
+            if count and seen >= rank:
+                return bucket_limit(index) / 1e3
+        return 0.0
+
+    def snapshot(self):
+        stages = {}
+        for stage, histogram in self.histograms.items():
+            count = sum(histogram)
+            stages[stage] = {
+                "count": count,
+                "total_us": self.totals[stage] / 1e3,
+                "mean_us": self.totals[stage] / count / 1e3,
+                "max_us": self.maxima[stage] / 1e3,
+                "p50_us": self.percentile(stage, 50),
+                "p99_us": self.percentile(stage, 99),
+                # Bucket upper bound in microseconds -> count
+                "histogram_us": {f"{bucket_limit(index) / 1e3:g}": n for index, n in enumerate(histogram) if n},
+            }
+        return {"bars": self.bars, "stages": stages, "counters": dict(self.counters)}
+
+    def export(self):
+        snapshot = self.snapshot()
+        if self.object_store is not None:
+            self.object_store.Save(self.key, json.dumps(snapshot))
+        return snapshot
@@ -0,0 +1,97 @@
+import json
+from io import StringIO
+import numpy as np
+import pandas as pd
+
+
+class Journal:
+    # Append-only table persisted to the ObjectStore as CSV chunks under `<key>_chunks/<n>`, plus
+    # a small `<key>_chunks/manifest`. Appends land in preallocated column buffers; a flush writes
+    # only the rows added since the previous one. compact() rebuilds the full table under `key`
+    # itself. The chunks sit under their own prefix because LEAN saves keys as file paths, and
+    # `key` cannot be both the compacted file and the chunks' folder.
+    def __init__(self, object_store, key, columns, flush_rows=20, resume=False):
+        self.object_store = object_store
+        self.key = key
+        self.dtypes = {name: np.dtype(dtype) for name, dtype in columns.items()}
+        self.flush_rows = max(1, flush_rows)
+        self.buffers = {name: np.empty(self.flush_rows, dtype=dtype) for name, dtype in self.dtypes.items()}
+        self.pending = 0
+        self.chunks = 0
+        self.rows = 0
+        manifest = self.read_manifest()
+        if resume:
+            self.chunks = manifest["chunks"]
+            self.rows = manifest["rows"]
+        else:
+            self.delete_chunks(manifest["chunks"])
+
+    def chunk_key(self, n):
+        return f"{self.key}_chunks/{n:06d}"
+
+    @property
+    def manifest_key(self):
+        return f"{self.key}_chunks/manifest"
+
+    def read_manifest(self):
+        if self.object_store.ContainsKey(self.manifest_key):
+            return json.loads(self.object_store.Read(self.manifest_key))
+        return {"chunks": 0, "rows": 0}
+
+    def delete_chunks(self, count):
+        for n in range(count):
+            if self.object_store.ContainsKey(self.chunk_key(n)):
+                self.object_store.Delete(self.chunk_key(n))
+        if self.object_store.ContainsKey(self.manifest_key):
+            self.object_store.Delete(self.manifest_key)
+
+    def append(self, record):
+        i = self.pending
+        for name, buffer in self.buffers.items():
+            value = record.get(name)
+            buffer[i] = np.datetime64(value, "s") if buffer.dtype.kind == "M" else value
+        self.pending += 1
+        self.rows += 1
+        if self.pending >= self.flush_rows:
+            self.flush()
+
+    def pending_frame(self):
+        return pd.DataFrame({name: buffer[:self.pending] for name, buffer in self.buffers.items()})
+
+    def flush(self):
+        if not self.pending:
+            return False
+        self.object_store.Save(self.chunk_key(self.chunks), self.pending_frame().to_csv(index=False))
+        self.chunks += 1
+        self.object_store.Save(self.manifest_key, json.dumps({"chunks": self.chunks, "rows": self.rows}))
+        self.pending = 0
+        return True
+
+    def parse(self, text):
+        dates = [name for name, dtype in self.dtypes.items() if dtype.kind == "M"]
+        return pd.read_csv(StringIO(text), parse_dates=dates)
+
+    def read(self):
+        frames = [self.parse(self.object_store.Read(self.chunk_key(n))) for n in range(self.chunks)]
+        if self.pending:
+            frames.append(self.pending_frame())
+        if not frames:
+            return pd.DataFrame({name: np.empty(0, dtype=dtype) for name, dtype in self.dtypes.items()})
+        return pd.concat(frames, ignore_index=True)
+
+    def compact(self):
+        # Folds every chunk into one and republishes the whole table under the journal's own key
+        self.flush()
+        table = self.read()
+        if table.empty:
+            return table
+        csv_data = table.to_csv(index=False)
+        self.delete_chunks(self.chunks)
+        self.object_store.Save(self.chunk_key(0), csv_data)
+        self.chunks = 1
+        self.object_store.Save(self.manifest_key, json.dumps({"chunks": self.chunks, "rows": self.rows}))
+        self.object_store.Save(self.key, csv_data)
+        return table
+
+    def __len__(self):
+        return self.rows
@@ -0,0 +1,60 @@
+import os
+import tempfile
+
+
+class LocalObjectStore:
+    # File-backed stand-in for the QuantConnect ObjectStore, one file per key under `root`
+    # (a fresh temporary directory by default). Keys are stored as paths, "/" making folders, as
+    # LEAN stores them, so a key saved where another key needs a folder ("Trade_Log" and
+    # "Trade_Log/000000") fails here as it would on LEAN.
+    def __init__(self, root=None):
+        if root is None:
+            self.tempdir = tempfile.TemporaryDirectory(prefix="objectstore-")
+            root = self.tempdir.name
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+
+    def GetFilePath(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def ContainsKey(self, key):
+        return os.path.isfile(self.GetFilePath(key))
+
+    def Save(self, key, text):
+        path = self.GetFilePath(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return True
+
+    def SaveBytes(self, key, data):
+        path = self.GetFilePath(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return True
+
+    def Read(self, key):
+        with open(self.GetFilePath(key), encoding="utf-8") as f:
+            return f.read()
+
+    def ReadBytes(self, key):
+        with open(self.GetFilePath(key), "rb") as f:
+            return f.read()
+
+    def Delete(self, key):
+        if not self.ContainsKey(key):
+            return False
+        path = self.GetFilePath(key)
+        os.remove(path)
+        # Folders left empty go too, so their name is free for a key again
+        folder = os.path.dirname(path)
+        while folder != self.root and not os.listdir(folder):
+            os.rmdir(folder)
+            folder = os.path.dirname(folder)
+        return True
+
+    @property
+    def Keys(self):
+        return sorted(os.path.relpath(os.path.join(folder, name), self.root).replace(os.sep, "/")
+                      for folder, _, names in os.walk(self.root) for name in names)
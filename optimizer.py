@@ -0,0 +1,193 @@
+import math
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from regime import RegimeEngine
+from strategy import ALLOCATIONS, LEVERAGE
+from training import TrainingFeatures, calendar_days, price_arrays, regime_weights, simulate_portfolio
+
+DEFAULT_SPACE = {
+    "z_score_entry": [0.8, 1.0, 1.2],
+    "momentum_threshold": [0.00005, 0.00007, 0.00009],
+    "atr_multiplier": [1.0, 1.5, 2.0],
+    "pairs_trailing_stop": [0.02, 0.03, 0.05],
+    "base_drawdown_limit": [0.02, 0.03, 0.05],
+    "lookback": [10, 15, 20],
+}
+COLUMN_PARAMS = ["z_score_entry", "momentum_threshold", "atr_multiplier", "pairs_trailing_stop", "base_drawdown_limit"]
+
+# Worker-side state: shared price arrays attached once per process, features cached per lookback
+worker_arrays = {}
+worker_blocks = []
+worker_features = {}
+
+
+class SharedArrays:
+    # Price arrays copied once into shared memory; workers map them instead of unpickling per task
+    def __init__(self, arrays):
+        self.blocks = []
+        self.specs = {}
+        for name, values in arrays.items():
+            values = np.ascontiguousarray(values)
+            block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(values.shape, values.dtype, buffer=block.buf)[:] = values
+            self.blocks.append(block)
+            self.specs[name] = (block.name, values.shape, values.dtype.str)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+def attach_shared(specs):
+    worker_arrays.clear()
+    worker_features.clear()
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        worker_blocks.append(block)
+        worker_arrays[name] = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+
+
+def evaluate_task(lookback, start_date, end_date, params, weights, score="final_equity"):
+    if lookback not in worker_features:
+        worker_features[lookback] = TrainingFeatures(lookback=lookback, **worker_arrays)
+    days = worker_features[lookback].days(start_date, end_date)
+    portfolio = simulate_portfolio(days, params["z_score_entry"], params["momentum_threshold"], params["atr_multiplier"],
+                                   params["pairs_trailing_stop"], drawdown_limit=params["base_drawdown_limit"], **weights)
+    return portfolio.score(score)
+
+
+def walk_forward_windows(start_date, end_date, train_days, test_days, step_days=None):
+    step_days = step_days or test_days
+    windows = []
+    train_start = start_date
+    while train_start + timedelta(days=train_days + test_days - 1) <= end_date:
+        train_end = train_start + timedelta(days=train_days - 1)
+        windows.append((train_start, train_end, train_end + timedelta(days=1), train_end + timedelta(days=test_days)))
+        train_start += timedelta(days=step_days)
+    return windows
+
+
+def sample_candidates(space, count, rng):
+    names = list(space)
+    sizes = [len(space[name]) for name in names]
+    total = math.prod(sizes)
+    picks = np.arange(total) if count is None or count >= total else rng.choice(total, count, replace=False)
+    positions = np.unravel_index(picks, sizes)
+    return pd.DataFrame({name: np.asarray(space[name])[pos] for name, pos in zip(names, positions)})
+
+
+class WalkForwardOptimizer:
+    # Sleeve weights and vol_limit follow `regimes` (a built RegimeEngine) day by day, as in
+    # RunTraining; without one every day is Recovery.
+    def __init__(self, forex_close, vix_value, nvda_close, amd_close, space=None, regimes=None, allocations=ALLOCATIONS,
+                 leverage=LEVERAGE, workers=None, seed=0, score="final_equity"):
+        self.arrays = price_arrays(forex_close, vix_value, nvda_close, amd_close)
+        self.space = space or DEFAULT_SPACE
+        self.regimes = regimes if regimes is not None else RegimeEngine()
+        self.allocations = allocations
+        self.leverage = leverage
+        self.workers = os.cpu_count() if workers is None else workers
+        self.rng = np.random.default_rng(seed)
+        self.score = score
+
+    def weights(self, start_date, end_date):
+        return regime_weights(self.regimes.codes_at(calendar_days(start_date, end_date)), self.allocations, self.leverage)
+
+    def evaluate(self, pool, jobs):
+        # jobs: (candidates DataFrame, start, end); every lookback group is split into one chunk per worker
+        futures = []
+        for job_index, (candidates, start_date, end_date) in enumerate(jobs):
+            weights = self.weights(start_date, end_date)
+            for lookback, group in candidates.groupby("lookback"):
+                for chunk in np.array_split(group.index.to_numpy(), max(1, min(self.workers, len(group)))):
+                    params = {name: candidates.loc[chunk, name].to_numpy(dtype=float) for name in COLUMN_PARAMS}
+                    args = (int(lookback), start_date, end_date, params, weights, self.score)
+                    result = pool.submit(evaluate_task, *args) if pool else evaluate_task(*args)
+                    futures.append((job_index, chunk, result))
+        scores = [pd.Series(np.nan, index=candidates.index) for candidates, _, _ in jobs]
+        for job_index, chunk, result in futures:
+            scores[job_index].loc[chunk] = result.result() if pool else result
+        return scores
+
+    def search(self, pool, windows, method, candidates, eta):
+        pools = [candidates.copy() for _ in windows]
+        if method == "random":
+            scores = self.evaluate(pool, [(c, w[0], w[1]) for c, w in zip(pools, windows)])
+            return [c.assign(score=s) for c, s in zip(pools, scores)]
+        # Successive halving: early rungs score on the most recent slice of each training window
+        rungs = max(1, math.ceil(math.log(len(candidates), eta)))
+        for rung in range(rungs + 1):
+            fraction = min(1.0, eta ** (rung - rungs))
+            jobs = []
+            for c, (train_start, train_end, _, _) in zip(pools, windows):
+                span = (train_end - train_start).days + 1
+                jobs.append((c, max(train_start, train_end - timedelta(days=math.ceil(span * fraction) - 1)), train_end))
+            scores = self.evaluate(pool, jobs)
+            pools = [c.assign(score=s) for c, s in zip(pools, scores)]
+            if fraction >= 1.0:
+                break
+            pools = [c.nlargest(max(1, math.ceil(len(c) / eta)), "score").drop(columns="score") for c in pools]
+        return pools
+
+    def run(self, windows, method="halving", samples=64, eta=3):
+        if method not in ("random", "halving"):
+            raise ValueError(f"Unknown search method: {method}")
+        candidates = sample_candidates(self.space, samples, self.rng)
+        shared = SharedArrays(self.arrays)
+        try:
+            if self.workers:
+                with ProcessPoolExecutor(self.workers, initializer=attach_shared, initargs=(shared.specs,)) as pool:
+                    ranked = self.search(pool, windows, method, candidates, eta)
+                    best = [r.loc[r["score"].idxmax()] for r in ranked]
+                    tests = self.evaluate(pool, [(b.to_frame().T, w[2], w[3]) for b, w in zip(best, windows)])
+            else:
+                attach_shared(shared.specs)
+                ranked = self.search(None, windows, method, candidates, eta)
+                best = [r.loc[r["score"].idxmax()] for r in ranked]
+                tests = self.evaluate(None, [(b.to_frame().T, w[2], w[3]) for b, w in zip(best, windows)])
+        finally:
+            worker_arrays.clear()
+            worker_features.clear()
+            for block in worker_blocks:
+                block.close()
+            worker_blocks.clear()
+            shared.close()
+        rows = []
+        for (train_start, train_end, test_start, test_end), b, test in zip(windows, best, tests):
+            row = {"train_start": train_start, "train_end": train_end, "test_start": test_start, "test_end": test_end}
+            row.update({name: b[name] for name in self.space})
+            row[f"train_{self.score}"] = b["score"]
+            row[f"test_{self.score}"] = test.iloc[0]
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward parameter search over the RunTraining simulation")
+    parser.add_argument("asset_csv", help="asset_data.csv exported by assets_data.ipynb")
+    parser.add_argument("economic_csv", help="economic_indicators_data.csv exported by economic_indicators_data.ipynb")
+    parser.add_argument("--start", default="2017-01-01")
+    parser.add_argument("--end", default="2025-05-29")
+    parser.add_argument("--train-days", type=int, default=730)
+    parser.add_argument("--test-days", type=int, default=180)
+    parser.add_argument("--method", choices=["random", "halving"], default="halving")
+    parser.add_argument("--samples", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--score", choices=["final_equity", "equity", "sharpe", "calmar"], default="final_equity")
+    args = parser.parse_args()
+    assets = pd.read_csv(args.asset_csv, parse_dates=["Date"], index_col="Date")
+    economic = pd.read_csv(args.economic_csv, parse_dates=["Date"], index_col="Date")
+    regimes = RegimeEngine()
+    regimes.build(economic.index, economic["VIX"].to_numpy(), assets["IEF"].dropna() if "IEF" in assets.columns else None)
+    optimizer = WalkForwardOptimizer(assets["EURUSD"].dropna(), economic["VIX"].dropna(), assets["NVDA"].dropna(), assets["AMD"].dropna(),
+                                     regimes=regimes, workers=args.workers, seed=args.seed, score=args.score)
+    windows = walk_forward_windows(datetime.fromisoformat(args.start), datetime.fromisoformat(args.end), args.train_days, args.test_days)
+    print(optimizer.run(windows, method=args.method, samples=args.samples).to_string())
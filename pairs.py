@@ -0,0 +1,214 @@
+import numpy as np
+
+# Engle-Granger 5% critical value for the residual ADF t-statistic with two series
+ADF_CRITICAL = -3.34
+
+
+def cointegration_t(y, x):
+    # Columns of y regressed on the matching columns of x (with intercept); returns the hedge
+    # ratio and the Dickey-Fuller t-statistic of the residual, one per column
+    x = x - x.mean(axis=0)
+    y = y - y.mean(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        beta = (x * y).sum(axis=0) / (x * x).sum(axis=0)
+        residual = y - beta * x
+        lagged = residual[:-1]
+        change = np.diff(residual, axis=0)
+        lagged_ss = (lagged * lagged).sum(axis=0)
+        gamma = (lagged * change).sum(axis=0) / lagged_ss
+        error = change - gamma * lagged
+        se = np.sqrt((error * error).sum(axis=0) / max(len(change) - 1, 1) / lagged_ss)
+        return beta, gamma / se
+
+
+class PairsEngine:
+    # Log-spread pairs over a universe of symbols. Log prices sit in a mirrored date x symbol
+    # matrix (every row written at i and i + capacity) so trailing windows are contiguous views.
+    # Candidate pairs are index arrays into it, and the per-pair state (direction, spread peak,
+    # trailing highs) lives in arrays over the candidates, so z-scores, screening and the
+    # entry/exit rules are whole-array operations. Given `pairs`, those are the only candidates
+    # and all are tradeable; otherwise every symbol pair is screened every `screen_every` bars
+    # on return correlation and an Engle-Granger cointegration test.
+    def __init__(self, symbols, lookback=15, pairs=None, screen_window=60, screen_every=5, min_correlation=0.7,
+                 adf_critical=ADF_CRITICAL, max_pairs=1, chunk_size=4096):
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.lookback = lookback
+        self.screen_window = screen_window
+        self.screen_every = screen_every
+        self.min_correlation = min_correlation
+        self.adf_critical = adf_critical
+        self.max_pairs = max_pairs
+        self.chunk_size = chunk_size
+        self.capacity = max(lookback, screen_window if pairs is None else 0) + 1
+        self.prices = np.full((2 * self.capacity, len(self.symbols)), np.nan)
+        self.last = np.full(len(self.symbols), np.nan)
+        self.head = 0
+        self.rows = 0
+        if pairs is None:
+            self.first, self.second = np.triu_indices(len(self.symbols), 1)
+            self.selected = np.zeros(len(self.first), dtype=bool)
+        else:
+            self.first = np.array([self.index[a] for a, _ in pairs], dtype=np.intp)
+            self.second = np.array([self.index[b] for _, b in pairs], dtype=np.intp)
+            self.selected = np.ones(len(self.first), dtype=bool)
+        self.screening = pairs is None
+        self.last_screen = None
+        # Open or tradeable pairs with their leg indices, rebuilt only when either set changes
+        self.active_pairs = None
+        self.open_pairs = 0
+        count = len(self.first)
+        # +1 is long the first symbol and short the second, -1 the reverse
+        self.direction = np.zeros(count)
+        self.spread_high = np.full(count, np.nan)
+        self.first_high = np.full(count, np.nan)
+        self.second_high = np.full(count, np.nan)
+        self.correlation = np.full(count, np.nan)
+        self.hedge_ratio = np.full(count, np.nan)
+        self.adf_t = np.full(count, np.nan)
+
+    def update(self, prices):
+        # One row per date; NaN (or non-positive) prices carry the symbol's last log price forward
+        prices = np.asarray(prices, dtype=float)
+        np.log(prices, out=self.last, where=prices > 0)
+        self.prices[self.head] = self.prices[self.head + self.capacity] = self.last
+        self.head = (self.head + 1) % self.capacity
+        self.rows += 1
+
+    def window(self, length):
+        length = min(length, self.rows, self.capacity)
+        end = self.head + self.capacity
+        return self.prices[end - length:end]
+
+    def pair_label(self, p):
+        return f"{self.symbols[self.first[p]]}/{self.symbols[self.second[p]]}"
+
+    @property
+    def due(self):
+        return self.screening and self.rows >= self.screen_window and (self.last_screen is None or self.rows - self.last_screen >= self.screen_every)
+
+    def screen(self):
+        # Marks as tradeable the pairs whose returns correlate above min_correlation and whose
+        # log prices cointegrate, best `max_pairs` ADF statistics first
+        self.last_screen = self.rows
+        logs = self.window(self.screen_window)
+        returns = np.diff(logs, axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            standardized = (returns - returns.mean(axis=0)) / returns.std(axis=0)
+        correlation = standardized.T @ standardized / len(returns)
+        self.correlation = correlation[self.first, self.second]
+        self.hedge_ratio[:] = np.nan
+        self.adf_t[:] = np.nan
+        with np.errstate(invalid="ignore"):
+            candidates = np.flatnonzero(self.correlation >= self.min_correlation)
+        for start in range(0, len(candidates), self.chunk_size):
+            chunk = candidates[start:start + self.chunk_size]
+            self.hedge_ratio[chunk], self.adf_t[chunk] = cointegration_t(logs[:, self.first[chunk]], logs[:, self.second[chunk]])
+        with np.errstate(invalid="ignore"):
+            passing = np.flatnonzero(self.adf_t < self.adf_critical)
+        self.selected[:] = False
+        self.selected[passing[np.argsort(self.adf_t[passing])[:self.max_pairs]]] = True
+        self.active_pairs = None
+        return passing
+
+    def statistics(self, first, second):
+        # Latest log spread, z-score against the trailing `lookback` spreads (population std, as
+        # np.std computes it) and readiness of the pairs with legs `first` and `second`
+        if self.rows < self.lookback:
+            nan = np.full(len(first), np.nan)
+            return nan, nan, np.zeros(len(first), dtype=bool)
+        logs = self.window(self.lookback)
+        spreads = logs[:, first] - logs[:, second]
+        spread = spreads[-1]
+        # NaN anywhere in a pair's window (a symbol without bars yet) carries through to its z-score
+        deviation = spreads - spreads.sum(axis=0) / self.lookback
+        std = np.sqrt((deviation * deviation).sum(axis=0) / self.lookback)
+        z_score = np.divide(deviation[-1], std, out=np.zeros(len(first)), where=std != 0)
+        z_score[np.isnan(std)] = np.nan
+        return spread, z_score, ~np.isnan(z_score)
+
+    def targets(self, weight, direction=None):
+        # Net per-symbol weight of every open pair (of `direction`, a saved copy, if given), `weight` per leg
+        direction = self.direction if direction is None else direction
+        held = direction != 0
+        legs = direction[held] * weight
+        return (np.bincount(self.first[held], weights=legs, minlength=len(self.symbols))
+                - np.bincount(self.second[held], weights=legs, minlength=len(self.symbols)))
+
+    def active(self):
+        # (pairs, first legs, second legs) of every open or tradeable pair
+        if self.active_pairs is None:
+            pairs = np.flatnonzero(self.selected | (self.direction != 0))
+            self.active_pairs = pairs, self.first[pairs], self.second[pairs]
+        return self.active_pairs
+
+    def exits(self, pairs, z_score, first_price, second_price, trailing_stop):
+        # Updates the spread peak and trailing highs of open pairs and closes those that hit the
+        # z-score (|z| > 3 or below 95% of its peak), near-zero or trailing-stop exits. Returns
+        # the pair indices closed by each rule.
+        held = self.direction[pairs] != 0
+        p = pairs[held]
+        if not len(p):
+            return p, p, p
+        z = np.abs(z_score[held])
+        self.spread_high[p] = np.fmax(self.spread_high[p], z)
+        self.first_high[p] = np.fmax(self.first_high[p], first_price[held])
+        self.second_high[p] = np.fmax(self.second_high[p], second_price[held])
+        exit_z = (z > 3) | (z < self.spread_high[p] * 0.95)
+        exit_zero = ~exit_z & (z < 0.05)
+        exit_stop = ~exit_z & ~exit_zero & ((first_price[held] < self.first_high[p] * (1 - trailing_stop))
+                                            | (second_price[held] < self.second_high[p] * (1 - trailing_stop)))
+        closed = p[exit_z | exit_zero | exit_stop]
+        if not len(closed):
+            return closed, closed, closed
+        self.active_pairs = None
+        self.open_pairs -= len(closed)
+        self.direction[closed] = 0
+        self.first_high[closed] = np.nan
+        self.second_high[closed] = np.nan
+        # The trailing-stop exit leaves the spread peak in place, as the NVDA/AMD sleeve always has
+        self.spread_high[p[exit_z | exit_zero]] = np.nan
+        return p[exit_z], p[exit_zero], p[exit_stop]
+
+    def stops(self, pairs, first_price, second_price, trailing_stop):
+        # The trailing-stop exit alone, for prices between daily bars: raises the trailing highs
+        # of the open pairs among `pairs` and closes those either leg fell `trailing_stop` below
+        held = self.direction[pairs] != 0
+        p = pairs[held]
+        if not len(p):
+            return p
+        first_price, second_price = first_price[held], second_price[held]
+        self.first_high[p] = np.fmax(self.first_high[p], first_price)
+        self.second_high[p] = np.fmax(self.second_high[p], second_price)
+        closed = p[(first_price < self.first_high[p] * (1 - trailing_stop)) | (second_price < self.second_high[p] * (1 - trailing_stop))]
+        if len(closed):
+            self.active_pairs = None
+            self.open_pairs -= len(closed)
+            self.direction[closed] = 0
+            self.first_high[closed] = np.nan
+            self.second_high[closed] = np.nan
+        return closed
+
+    def entries(self, pairs, z_score, spread, first_price, second_price, z_score_entry):
+        # Opens flat, tradeable pairs with |z| above the entry threshold and a usable spread, up to
+        # max_pairs open at once (largest |z| first): short the first symbol when z is positive
+        eligible = (self.selected[pairs] & (self.direction[pairs] == 0) & (np.abs(z_score) > z_score_entry)
+                    & np.isfinite(spread) & (spread != 0))
+        candidates = np.flatnonzero(eligible)
+        free = self.max_pairs - self.open_pairs
+        if len(candidates) > free:
+            candidates = candidates[np.argsort(-np.abs(z_score[candidates]), kind="stable")[:max(free, 0)]]
+        opened = pairs[candidates]
+        if len(opened):
+            self.active_pairs = None
+            self.open_pairs += len(opened)
+        self.direction[opened] = np.where(z_score[candidates] > z_score_entry, -1.0, 1.0)
+        self.first_high[opened] = first_price[candidates]
+        self.second_high[opened] = second_price[candidates]
+        return opened
+
+    def flatten(self):
+        # Positions closed outside the engine (drawdown liquidation); peaks and highs are left as they were
+        self.direction[:] = 0
+        self.active_pairs = None
+        self.open_pairs = 0
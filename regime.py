@@ -0,0 +1,130 @@
+import numpy as np
+from streaming_indicators import RingBuffer
+
+REGIMES = ["Recovery", "Overheat", "Stagflation", "Reflation"]
+RECOVERY, OVERHEAT, STAGFLATION, REFLATION = range(4)
+NO_SIGNAL = -1
+CRISIS = -2  # VIX above 35: Stagflation at once, confirmation count reset
+
+
+def classify(vix, ief_ret):
+    vix = np.asarray(vix, dtype=float)
+    ief_ret = np.asarray(ief_ret, dtype=float)
+    with np.errstate(invalid="ignore"):
+        conditions = [vix > 35,
+                      (ief_ret > 0) & (vix < 15),
+                      (ief_ret < 0.02) & (vix > 25),
+                      (ief_ret < 0) & (vix > 30),
+                      (ief_ret > 0) & (vix <= 20)]
+    return np.select(conditions, [CRISIS, RECOVERY, OVERHEAT, STAGFLATION, REFLATION], NO_SIGNAL).astype(np.int8)
+
+
+def trailing_return(closes, lag, window):
+    # Return over `lag` bars when only the latest `window` bars are visible, 0 otherwise
+    closes = np.asarray(closes, dtype=float)
+    out = np.zeros(len(closes))
+    if lag <= window and len(closes) >= lag:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[lag - 1:] = (closes[lag - 1:] - closes[:len(closes) - lag + 1]) / closes[:len(closes) - lag + 1]
+    return out
+
+
+class RegimeEngine:
+    # Investment-clock regime as a dense per-calendar-day int8 timeline, so a lookup is one index.
+    # The IEF return reads a 20-bar window but asks for a 20 * 24 bar lag, which keeps it at 0 as
+    # the original DetermineCycle did; both are parameters should that be revisited.
+    def __init__(self, initial="Recovery", confirm_days=5, ief_window=20, ief_lag=20 * 24):
+        self.initial = REGIMES.index(initial)
+        self.confirm_days = confirm_days
+        self.ief_window = ief_window
+        self.ief_lag = ief_lag
+        self.ief_closes = RingBuffer(ief_window)
+        self.start = None
+        self.timeline = np.zeros(0, dtype=np.int8)
+        self.length = 0
+        self.current = self.initial
+        self.candidate = self.initial
+        self.confirmed = 0
+
+    def step(self, code):
+        if code == CRISIS:
+            self.confirmed = 0
+            self.current = STAGFLATION
+            return
+        new = self.current if code == NO_SIGNAL else code
+        if new == self.candidate:
+            self.confirmed += 1
+            if self.confirmed >= self.confirm_days:
+                self.current = new
+        else:
+            self.candidate = new
+            self.confirmed = 1
+
+    def build(self, dates, vix, ief_close=None):
+        # Evaluates every date in `dates` (the Economic_Indicators index) in one pass
+        dates = np.array(dates, dtype="datetime64[D]")
+        ief_ret = np.zeros(len(dates))
+        if ief_close is not None and len(ief_close):
+            ief_dates = np.array(ief_close.index, dtype="datetime64[D]")
+            returns = trailing_return(ief_close.to_numpy(dtype=float), self.ief_lag, self.ief_window)
+            positions = np.searchsorted(ief_dates, dates, side="right") - 1
+            ief_ret = np.where(positions >= 0, returns[np.maximum(positions, 0)], 0.0)
+        codes = classify(np.asarray(vix, dtype=float), ief_ret)
+        regimes = np.empty(len(codes), dtype=np.int8)
+        for i, code in enumerate(codes.tolist()):
+            self.step(code)
+            regimes[i] = self.current
+        if len(dates) == 0:
+            return
+        self.start = dates[0]
+        days = np.arange(dates[0], dates[-1] + 1)
+        positions = np.searchsorted(dates, days, side="right") - 1
+        self.timeline = regimes[positions]
+        self.length = len(self.timeline)
+
+    def update(self, date, vix, ief_close=None):
+        # Incremental path for bars past the built timeline; earlier dates are already final
+        day = np.datetime64(date, "D")
+        if ief_close is not None:
+            self.ief_closes.push(ief_close)
+        if self.start is not None and day < self.start + self.length:
+            return self.regime_at(day)
+        ief_ret = 0.0
+        if self.ief_lag <= self.ief_window and len(self.ief_closes) >= self.ief_lag:
+            base = self.ief_closes[-self.ief_lag]
+            ief_ret = (self.ief_closes[-1] - base) / base
+        self.step(int(classify(vix, ief_ret)))
+        self.extend_to(day)
+        return REGIMES[self.current]
+
+    def extend_to(self, day):
+        if self.start is None:
+            self.start = day
+        needed = int((day - self.start).astype(int)) + 1
+        if needed > len(self.timeline):
+            grown = np.empty(max(needed, 2 * len(self.timeline)), dtype=np.int8)
+            grown[:self.length] = self.timeline[:self.length]
+            self.timeline = grown
+        # Days without an evaluation keep the regime that was in force
+        if needed > self.length + 1:
+            self.timeline[self.length:needed - 1] = self.timeline[self.length - 1] if self.length else self.initial
+        self.timeline[needed - 1] = self.current
+        self.length = needed
+
+    def code_at(self, date):
+        day = np.datetime64(date, "D")
+        if self.start is None or day < self.start:
+            return self.initial
+        offset = int((day - self.start).astype(int))
+        return int(self.timeline[min(offset, self.length - 1)])
+
+    def codes_at(self, days):
+        days = np.asarray(days, dtype="datetime64[D]")
+        if self.start is None:
+            return np.full(len(days), self.initial, dtype=np.int8)
+        offsets = (days - self.start).astype(int)
+        codes = self.timeline[np.clip(offsets, 0, self.length - 1)]
+        return np.where(offsets < 0, self.initial, codes).astype(np.int8)
+
+    def regime_at(self, date):
+        return REGIMES[self.code_at(date)]
@@ -0,0 +1,436 @@
+import argparse
+import json
+import math
+import time as clock
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from columnar import ColumnarFrame, COLUMNAR_SUFFIX
+from instrumentation import Instrumentation
+from journal import Journal
+from local_store import LocalObjectStore
+from training_cache import TrainingCache
+from regime import REGIMES
+from strategy import MultiPMStrategy, ALLOCATION_COLUMNS, TRADE_LOG_COLUMNS
+
+SYMBOLS = ["EURUSD", "NVDA", "AMD", "IEF", "GLD", "VIX"]
+FOREX, NVDA, AMD, IEF, GLD, VIX = SYMBOLS
+TRADABLE = SYMBOLS[:5]
+# LEAN defaults for the subscriptions in main.py: 2x margin on equities, 50x on FXCM forex
+DEFAULT_LEVERAGE = {FOREX: 50.0, NVDA: 2.0, AMD: 2.0, IEF: 2.0, GLD: 2.0}
+DEFAULT_LOT_SIZE = {FOREX: 1000, NVDA: 1, AMD: 1, IEF: 1, GLD: 1}
+ORDER_COLUMNS = ["Date", "Symbol", "Quantity", "Price", "Fee", "Status", "Tag"]
+
+
+def load_frame(source):
+    # asset_data.csv / economic_indicators_data.csv, their .pmcol copies, or an in-memory frame
+    if isinstance(source, ColumnarFrame):
+        return source
+    if isinstance(source, pd.DataFrame):
+        return ColumnarFrame.from_frame(source)
+    if str(source).endswith(COLUMNAR_SUFFIX):
+        return ColumnarFrame.open(source)
+    return ColumnarFrame.from_frame(pd.read_csv(source, parse_dates=["Date"], index_col="Date"))
+
+
+def timeline(assets, economic, end_date, symbols=SYMBOLS):
+    # Every asset or economic date up to end_date, with the values of `symbols` present on that
+    # date (NaN otherwise); VIX comes from the economic frame, everything else from the assets
+    end = np.datetime64(pd.Timestamp(end_date))
+    dates = np.union1d(assets.dates, economic.dates)
+    dates = dates[dates <= end]
+    values = np.full((len(dates), len(symbols)), np.nan)
+    for frame, names in [(assets, [symbol for symbol in symbols if symbol != VIX]), (economic, [VIX])]:
+        rows = np.searchsorted(dates, frame.dates[frame.dates <= end])
+        for name in names:
+            if name in frame.columns:
+                values[rows, symbols.index(name)] = frame.data[name][:len(rows)]
+    return dates, values
+
+
+def bar_stream(assets, economic, symbols, start_date, end_date, warmup_bars, intraday=None, chunk_rows=16384):
+    # (time, values in `symbols` order, NaN where absent) of every bar from `warmup_bars` daily
+    # bars before start_date to end_date: the daily timeline or, given an `intraday` frame of
+    # minute or hour closes, its bars with VIX still daily from `economic`, built `chunk_rows`
+    # bars at a time so the intraday history is never materialized as a whole
+    if intraday is None:
+        dates, values = timeline(assets, economic, end_date, symbols)
+        first = int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start_date))))
+        lo = max(0, first - warmup_bars)
+        yield from zip(pd.DatetimeIndex(dates[lo:]).to_pydatetime().tolist(), values[lo:].tolist())
+        return
+    first = int(np.searchsorted(assets.dates, np.datetime64(pd.Timestamp(start_date))))
+    begin = assets.dates[max(0, first - warmup_bars)] if len(assets) else np.datetime64(pd.Timestamp(start_date))
+    end = np.datetime64(pd.Timestamp(end_date))
+    lo, hi = intraday.bounds(begin, end)
+    for a in range(lo, hi, chunk_rows):
+        b = min(a + chunk_rows, hi)
+        # Economic rows from this chunk's first bar (the warm-up start for the first) to the next chunk's
+        since = begin if a == lo else intraday.dates[a]
+        economic_lo = int(np.searchsorted(economic.dates, since, side="left"))
+        economic_hi = int(np.searchsorted(economic.dates, intraday.dates[b], side="left")) if b < hi else economic.bounds(end=end)[1]
+        dates, values = timeline(intraday.rows(a, b), economic.rows(economic_lo, economic_hi), end_date, symbols)
+        yield from zip(pd.DatetimeIndex(dates).to_pydatetime().tolist(), values.tolist())
+
+
+class SimulatedBroker:
+    # Cash account with per-symbol leverage. Orders fill immediately at the last price plus
+    # slippage, in whole lots; an order is invalid when the margin it leaves in use would exceed
+    # the portfolio value. A mark that pushes used margin past the portfolio value is a margin
+    # call, answered by scaling every position down until the account fits again. Symbols past
+    # the defaults (a pairs universe) trade as equities.
+    def __init__(self, cash=100000, leverage=None, lot_size=None, fee_rate=0.0, slippage=0.0, free_portfolio_value=0.0025,
+                 verbose=False, symbols=TRADABLE):
+        self.cash = float(cash)
+        self.leverage = {**dict.fromkeys(symbols, DEFAULT_LEVERAGE[NVDA]), **DEFAULT_LEVERAGE, **(leverage or {})}
+        self.lot_size = {**dict.fromkeys(symbols, DEFAULT_LOT_SIZE[NVDA]), **DEFAULT_LOT_SIZE, **(lot_size or {})}
+        self.fee_rate = fee_rate
+        self.slippage = slippage
+        self.free_portfolio_value = free_portfolio_value
+        self.verbose = verbose
+        self.prices = {}
+        self.quantities = dict.fromkeys(symbols, 0.0)
+        self.time = None
+        self.holdings_cache = None
+        self.orders = []
+        self.messages = []
+        self.margin_calls = 0
+
+    def price(self, symbol, default=0):
+        return self.prices.get(symbol, 0) if symbol in self.quantities or symbol == VIX else default
+
+    def holdings_value(self):
+        # Cached between marks and fills, since the strategy asks for it many times per bar
+        if self.holdings_cache is None:
+            self.holdings_cache = sum(quantity * self.prices.get(symbol, 0) for symbol, quantity in self.quantities.items() if quantity)
+        return self.holdings_cache
+
+    def portfolio_value(self):
+        return self.cash + self.holdings_value()
+
+    def used_margin(self, quantities=None):
+        quantities = self.quantities if quantities is None else quantities
+        return sum(abs(quantity) * self.prices.get(symbol, 0) / self.leverage[symbol] for symbol, quantity in quantities.items() if quantity)
+
+    def margin_remaining(self):
+        return self.portfolio_value() - self.used_margin()
+
+    def invested(self, symbol):
+        return self.quantities.get(symbol, 0) != 0
+
+    def holding_value(self, symbol):
+        return self.quantities.get(symbol, 0) * self.prices.get(symbol, 0)
+
+    def round_lots(self, symbol, quantity):
+        lot = self.lot_size[symbol]
+        return math.trunc(quantity / lot) * lot
+
+    def order(self, symbol, quantity, tag):
+        price = self.prices.get(symbol, 0)
+        if quantity == 0:
+            return
+        if not price:
+            self.orders.append((self.time, symbol, quantity, 0.0, 0.0, "Invalid", tag))
+            return
+        after = dict(self.quantities)
+        after[symbol] += quantity
+        reduces = abs(after[symbol]) < abs(self.quantities[symbol])
+        fill = price * (1 + self.slippage if quantity > 0 else 1 - self.slippage)
+        fee = abs(quantity) * fill * self.fee_rate
+        if not reduces and self.used_margin(after) > self.portfolio_value() - fee:
+            self.orders.append((self.time, symbol, quantity, fill, 0.0, "Invalid", tag))
+            return
+        self.cash -= quantity * fill + fee
+        self.quantities[symbol] = after[symbol]
+        self.holdings_cache = None
+        self.orders.append((self.time, symbol, quantity, fill, fee, "Filled", tag))
+
+    def set_holdings(self, symbol, weight):
+        price = self.prices.get(symbol, 0)
+        if not price:
+            self.orders.append((self.time, symbol, 0.0, 0.0, 0.0, "Invalid", "SetHoldings"))
+            return
+        target = weight * self.portfolio_value() * (1 - self.free_portfolio_value) / price
+        self.order(symbol, self.round_lots(symbol, target) - self.quantities[symbol], "SetHoldings")
+
+    def liquidate(self, symbol=None):
+        for held in ([symbol] if symbol is not None else self.quantities):
+            self.order(held, -self.quantities[held], "Liquidate")
+
+    def mark(self, time, values):
+        self.time = time
+        for symbol, value in values.items():
+            self.prices[symbol] = value
+        self.holdings_cache = None
+        used = self.used_margin()
+        value = self.portfolio_value()
+        if used > value:
+            self.margin_calls += 1
+            scale = max(value, 0.0) / used
+            for symbol in self.quantities:
+                held = self.quantities[symbol]
+                if held:
+                    self.order(symbol, self.round_lots(symbol, held * scale) - held, "Margin call")
+
+    def debug(self, message):
+        if self.verbose:
+            self.messages.append((self.time, message))
+
+
+def sleeve_returns(held, marks, equity, sleeves):
+    # Per-sleeve daily returns from the holdings carried into each bar and the price moves they
+    # were marked through, over the previous close's equity; Costs holds what the holdings miss
+    pnl = held[1:] * np.diff(marks, axis=0)
+    previous = equity[:-1]
+    returns = {}
+    for sleeve in dict.fromkeys(sleeves):
+        columns = [i for i, name in enumerate(sleeves) if name == sleeve]
+        returns[sleeve] = np.concatenate([[0.0], pnl[:, columns].sum(axis=1) / previous])
+    total = np.concatenate([[0.0], equity[1:] / previous - 1])
+    returns["Costs"] = total - sum(returns.values())
+    return returns
+
+
+class ReplayResult:
+    def __init__(self, equity, orders, allocations, events, trade_count, margin_calls, elapsed, metrics=None, sleeve_returns=None,
+                 margin_usage=None, regimes=None):
+        self.equity = equity
+        self.orders = orders
+        self.allocations = allocations
+        self.events = events
+        self.trade_count = trade_count
+        self.margin_calls = margin_calls
+        self.elapsed = elapsed
+        # Instrumentation snapshot (stage latency histograms and counters) when the replay was timed
+        self.metrics = metrics
+        # Daily return contributed by each sleeve's holdings, plus the Costs (fees, slippage and
+        # rounding) that make the columns sum to the equity curve's return
+        self.sleeve_returns = sleeve_returns
+        # Used margin over portfolio value at each close, and the regime label of each day
+        self.margin_usage = margin_usage
+        self.regimes = regimes
+
+    @property
+    def stats(self):
+        equity = self.equity
+        returns = equity.pct_change().dropna()
+        years = max((equity.index[-1] - equity.index[0]).days / 365.25, 1 / 365.25) if len(equity) else 0
+        status = self.orders["Status"].value_counts() if len(self.orders) else pd.Series(dtype=int)
+        return {
+            "start_equity": float(equity.iloc[0]) if len(equity) else math.nan,
+            "end_equity": float(equity.iloc[-1]) if len(equity) else math.nan,
+            "total_return": float(equity.iloc[-1] / equity.iloc[0] - 1) if len(equity) else math.nan,
+            "cagr": float((equity.iloc[-1] / equity.iloc[0]) ** (1 / years) - 1) if years and equity.iloc[-1] > 0 else math.nan,
+            "sharpe": float(returns.mean() / returns.std() * math.sqrt(252)) if len(returns) > 1 and returns.std() else math.nan,
+            "max_drawdown": float((1 - equity / equity.cummax()).max()) if len(equity) else math.nan,
+            "filled_orders": int(status.get("Filled", 0)),
+            "invalid_orders": int(status.get("Invalid", 0)),
+            "margin_calls": self.margin_calls,
+            "forex_trades": self.trade_count["Forex"],
+            "pairs_trades": self.trade_count["Pairs"],
+            "elapsed_seconds": self.elapsed,
+        }
+
+
+class ReplayEngine:
+    # Drives MultiPMStrategy over the notebook exports the way LEAN drives main.py: warm-up bars
+    # feed the indicators only, ResetEquity runs at midnight of every calendar day and Rebalance
+    # on Mondays, both before that day's bar, then the bar is marked and OnData runs. A
+    # `pairs_universe` parameter adds those asset_data columns to the replayed symbols, a
+    # `forex_basket` parameter those FX columns, margined and lotted like EURUSD. `log_level`
+    # gates the strategy's messages and `metrics` turns on its stage timers and counters. A
+    # `training_cache` (a TrainingCache) lets repeated replays skip the training simulation.
+    # `intraday_data` (minute or hour closes of the traded symbols, as a frame or .csv/.pmcol
+    # file) replays at that resolution: the strategy consolidates the bars into daily ones and
+    # runs its stops on every bar, and the equity, sleeve returns and margin usage are kept
+    # per day, so memory does not grow with the bar count.
+    def __init__(self, asset_data, economic_data, start_date=datetime(2020, 1, 1), end_date=datetime(2025, 5, 29), cash=100000,
+                 training_start_date=datetime(2017, 1, 1), training_end_date=datetime(2018, 12, 31), warmup_bars=60,
+                 parameters=None, object_store=None, flush_rows=256, log_level="debug", metrics=False, training_cache=None,
+                 intraday_data=None, **broker_options):
+        self.assets = load_frame(asset_data)
+        self.intraday = load_frame(intraday_data) if intraday_data is not None else None
+        self.economic = load_frame(economic_data)
+        self.start_date = start_date
+        self.end_date = end_date
+        self.cash = cash
+        self.training_start_date = training_start_date
+        self.training_end_date = training_end_date
+        self.warmup_bars = warmup_bars
+        self.parameters = parameters or {}
+        self.object_store = object_store
+        self.flush_rows = flush_rows
+        self.log_level = log_level
+        self.metrics = metrics
+        self.training_cache = training_cache
+        self.broker_options = broker_options
+
+    def training_series(self, training_days, lookback):
+        # The bars LEAN's History calls in RunTraining return: the last N before the start date
+        before = self.start_date - timedelta(days=1)
+
+        def tail(frame, name, count):
+            if name not in frame.columns:
+                return pd.Series(dtype=float)
+            return frame.series(name, end=before).dropna().iloc[-count:]
+
+        return (tail(self.assets, FOREX, training_days + lookback + 20), tail(self.economic, VIX, training_days + 2),
+                tail(self.assets, NVDA, training_days + lookback + 20), tail(self.assets, AMD, training_days + lookback + 20))
+
+    def run(self):
+        started = clock.perf_counter()
+        store = self.object_store or LocalObjectStore()
+        basket = [symbol for symbol in self.parameters.get("forex_basket", ()) if symbol not in SYMBOLS]
+        symbols = SYMBOLS + basket + [symbol for symbol in self.parameters.get("pairs_universe", ()) if symbol not in SYMBOLS + basket]
+        options = dict(self.broker_options)
+        options["leverage"] = {**dict.fromkeys(basket, DEFAULT_LEVERAGE[FOREX]), **options.get("leverage", {})}
+        options["lot_size"] = {**dict.fromkeys(basket, DEFAULT_LOT_SIZE[FOREX]), **options.get("lot_size", {})}
+        broker = SimulatedBroker(self.cash, symbols=[symbol for symbol in symbols if symbol != VIX], **options)
+        allocation_history = Journal(store, "Allocation_History", ALLOCATION_COLUMNS, flush_rows=self.flush_rows)
+        trade_log = Journal(store, "Trade_Log", TRADE_LOG_COLUMNS, flush_rows=self.flush_rows)
+        metrics = Instrumentation(broker.debug, level=self.log_level, enabled=self.metrics, object_store=store)
+        strategy = MultiPMStrategy(broker, SYMBOLS, self.start_date, allocation_history, trade_log, metrics=metrics,
+                                   training_cache=self.training_cache, **self.parameters)
+        if VIX in self.economic.columns:
+            strategy.build_regimes(self.economic.dates, self.economic.data[VIX],
+                                   self.assets.series(IEF).dropna() if IEF in self.assets.columns else None)
+        training_days = (self.training_end_date - self.training_start_date).days
+        strategy.run_training(self.training_start_date, self.training_end_date, *self.training_series(training_days, strategy.lookback))
+
+        intraday = self.intraday is not None
+        stream = bar_stream(self.assets, self.economic, symbols, self.start_date, self.end_date, self.warmup_bars, self.intraday)
+        # Per period (a bar, or a day of intraday bars): its time, the holdings carried into it,
+        # the prices and equity it closed at and its used margin over equity
+        tradable = list(broker.quantities)
+        times, held, marks, equity, margin_usage = [], [], [], [], []
+        period = None
+        last_day = None
+        for time, row in stream:
+            present = {symbol: value for symbol, value in zip(symbols, row) if value == value}
+            live = time >= self.start_date
+            key = time.date() if intraday else time
+            starts = key != period
+            if starts and period is not None:
+                self.close_period(broker, tradable, marks, equity, margin_usage)
+            if live:
+                day = time.date()
+                calendar_day = last_day + timedelta(days=1) if last_day is not None else day
+                while calendar_day <= day:
+                    midnight = datetime.combine(calendar_day, datetime.min.time())
+                    broker.time = midnight
+                    strategy.reset_equity(midnight)
+                    if calendar_day.weekday() == 0:
+                        strategy.rebalance(midnight)
+                    calendar_day += timedelta(days=1)
+                last_day = day
+            if starts:
+                period = key
+                times.append(datetime.combine(key, datetime.min.time()) if intraday else time)
+                held.append([broker.quantities[symbol] for symbol in tradable])
+            broker.mark(time, present)
+            if intraday:
+                updated = strategy.consolidate(time, present)
+                if live and strategy.training_completed:
+                    if updated is None:
+                        strategy.on_bar(time)
+                    else:
+                        strategy.on_data(time, updated)
+            else:
+                updated = strategy.update_bars(time, present)
+                if live and strategy.training_completed:
+                    strategy.on_data(time, updated)
+        if period is not None:
+            self.close_period(broker, tradable, marks, equity, margin_usage)
+
+        allocation_history.flush()
+        trade_log.flush()
+        index = pd.DatetimeIndex(times, name="Date")
+        live = index >= pd.Timestamp(self.start_date)
+        equity = np.array(equity)
+        sleeves = sleeve_returns(np.array(held).reshape(-1, len(tradable)), np.array(marks).reshape(-1, len(tradable)), equity,
+                                 [strategy.sleeve(symbol) for symbol in tradable])
+        regimes = np.asarray(REGIMES)[strategy.regimes.codes_at(index.to_numpy())]
+        return ReplayResult(pd.Series(equity[live], index=index[live], name="Equity"),
+                            pd.DataFrame(broker.orders, columns=ORDER_COLUMNS), allocation_history.read(), trade_log.read(),
+                            dict(strategy.trade_count), broker.margin_calls, clock.perf_counter() - started,
+                            metrics.export() if self.metrics else None,
+                            pd.DataFrame(sleeves, index=index).loc[live],
+                            pd.Series(np.array(margin_usage)[live], index=index[live], name="MarginUsage"),
+                            pd.Series(regimes[live], index=index[live], name="Regime"))
+
+    def close_period(self, broker, tradable, marks, equity, margin_usage):
+        # The prices, equity and margin usage a period closed at, recorded before the next one starts
+        marks.append([broker.prices.get(symbol, 0.0) for symbol in tradable])
+        value = broker.portfolio_value()
+        equity.append(value)
+        margin_usage.append(broker.used_margin() / value if value > 0 else math.inf)
+
+
+def load_lean_equity(path):
+    # Daily closing equity from a LEAN backtest result json ("Strategy Equity" chart). Current
+    # LEAN writes [time, open, high, low, close] candles, older results {"x": time, "y": value}.
+    with open(path) as f:
+        result = json.load(f)
+    points = result["charts"]["Strategy Equity"]["series"]["Equity"]["values"]
+    if points and isinstance(points[0], dict):
+        times, equity = [p["x"] for p in points], [p["y"] for p in points]
+    else:
+        times, equity = [p[0] for p in points], [p[-1] for p in points]
+    series = pd.Series(equity, index=pd.to_datetime(times, unit="s").normalize(), name="Equity", dtype=float)
+    return series.groupby(level=0).last()
+
+
+def compare_with_lean(result, lean_path):
+    # Replay and LEAN equity side by side on the dates both report, with the relative difference
+    lean = load_lean_equity(lean_path)
+    frame = pd.concat({"replay": result.equity.groupby(result.equity.index.normalize()).last(), "lean": lean}, axis=1, join="inner")
+    frame["difference"] = frame["replay"] / frame["lean"] - 1
+    return frame
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay the Multi-PM strategy offline over the notebook data exports")
+    parser.add_argument("asset_csv", help="asset_data.csv (or .pmcol) exported by assets_data.ipynb")
+    parser.add_argument("economic_csv", help="economic_indicators_data.csv (or .pmcol) exported by economic_indicators_data.ipynb")
+    parser.add_argument("--start", default="2020-01-01")
+    parser.add_argument("--end", default="2025-05-29")
+    parser.add_argument("--cash", type=float, default=100000)
+    parser.add_argument("--fee-rate", type=float, default=0.0)
+    parser.add_argument("--slippage", type=float, default=0.0)
+    parser.add_argument("--training-score", choices=["equity", "final_equity", "sharpe", "calmar"], default="equity")
+    parser.add_argument("--pairs-universe", help="comma-separated asset_data columns screened for pairs alongside NVDA and AMD")
+    parser.add_argument("--max-pairs", type=int, default=1, help="pairs held at once, the EquityPair sleeve split evenly between them")
+    parser.add_argument("--forex-basket", help="comma-separated asset_data FX columns traded alongside EURUSD")
+    parser.add_argument("--log-level", choices=["debug", "info", "warning", "off"], default="debug")
+    parser.add_argument("--metrics-out", help="time the strategy's stages and write the latency histograms and counters to this json")
+    parser.add_argument("--training-cache", help="directory keeping training results between runs")
+    parser.add_argument("--intraday", help="minute or hour closes of the traded symbols (.csv or .pmcol) to replay at that resolution")
+    parser.add_argument("--lean", help="LEAN backtest result json to compare the equity curve against")
+    parser.add_argument("--equity-out", help="write the daily equity curve to this csv")
+    parser.add_argument("--orders-out", help="write the order log to this csv")
+    args = parser.parse_args()
+    engine = ReplayEngine(args.asset_csv, args.economic_csv, datetime.fromisoformat(args.start), datetime.fromisoformat(args.end),
+                          cash=args.cash, parameters={"training_score": args.training_score, "max_pairs": args.max_pairs,
+                                                      "pairs_universe": args.pairs_universe.split(",") if args.pairs_universe else [],
+                                                      "forex_basket": args.forex_basket.split(",") if args.forex_basket else []},
+                          log_level=args.log_level, metrics=bool(args.metrics_out),
+                          training_cache=TrainingCache(LocalObjectStore(args.training_cache)) if args.training_cache else None,
+                          intraday_data=args.intraday,
+                          fee_rate=args.fee_rate,
+                          slippage=args.slippage)
+    result = engine.run()
+    for name, value in result.stats.items():
+        print(f"{name}: {value}")
+    if args.equity_out:
+        result.equity.to_csv(args.equity_out)
+    if args.orders_out:
+        result.orders.to_csv(args.orders_out, index=False)
+    if args.metrics_out:
+        with open(args.metrics_out, "w") as f:
+            json.dump(result.metrics, f, indent=2)
+    if args.lean:
+        comparison = compare_with_lean(result, args.lean)
+        if comparison.empty:
+            parser.exit(1, "LEAN result shares no dates with the replay\n")
+        print(f"LEAN comparison over {len(comparison)} days: max |difference| {comparison['difference'].abs().max():.4%}, "
+              f"final difference {comparison['difference'].iloc[-1]:.4%}")
@@ -0,0 +1,170 @@
+import argparse
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from regime import REGIMES
+
+SLEEVES = ["Forex", "EquityPair", "Bond", "Gold"]
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+# OnData stops trading when margin remaining falls below this share of portfolio value
+MARGIN_FLOOR = 0.20
+
+
+def block_sources(rng, paths, days, block):
+    # Circular block bootstrap: each path is `block`-day runs of consecutive source days
+    starts = rng.integers(0, days, size=(paths, -(-days // block)))
+    offsets = np.arange(days)
+    return (starts[:, offsets // block] + offsets % block) % days
+
+
+def regime_sources(rng, paths, labels, block):
+    # Keeps the observed regime sequence and fills each regime's days with blocks drawn from the
+    # days of that regime only, taken in order as one circular series
+    sources = np.empty((paths, len(labels)), dtype=np.int64)
+    for code in np.unique(labels):
+        pool = np.flatnonzero(labels == code)
+        offsets = np.arange(len(pool))
+        starts = rng.integers(0, len(pool), size=(paths, -(-len(pool) // block)))
+        sources[:, pool] = pool[(starts[:, offsets // block] + offsets % block) % len(pool)]
+    return sources
+
+
+def path_statistics(returns, margin):
+    # Per-path statistics of a paths x days return matrix; `margin` is the used-margin share of
+    # equity carried into each day. A day whose loss leaves equity below the margin in use is a
+    # margin call, one that leaves less than MARGIN_FLOOR of equity free a margin breach.
+    after = 1 + returns
+    equity = np.cumprod(after, axis=1)
+    drawdown = 1 - equity / np.maximum.accumulate(np.maximum(equity, 1.0), axis=1)
+    std = returns.std(axis=1)
+    mean = returns.mean(axis=1)
+    years = returns.shape[1] / 252
+    final = equity[:, -1]
+    wiped = after <= 0
+    return {
+        "total_return": final - 1,
+        "cagr": np.where(final > 0, np.maximum(final, 0) ** (1 / years) - 1, -1.0),
+        "sharpe": np.divide(mean, std, out=np.zeros_like(mean), where=std > 0) * math.sqrt(252),
+        "max_drawdown": drawdown.max(axis=1),
+        "margin_calls": ((after < margin) | wiped).sum(axis=1),
+        "margin_breach_days": ((after * (1 - MARGIN_FLOOR) < margin) | wiped).sum(axis=1),
+    }
+
+
+def simulate_chunk(seed, paths, table, state, margin, labels, method, block):
+    # One chunk of paths: resampled source days and the statistics of the return matrix they
+    # give. `table` holds every source day's return under each distinct allocation and `state`
+    # the allocation in force on each path day, so the matrix is a single gather.
+    rng = np.random.default_rng(seed)
+    days = table.shape[1]
+    if method == "regime":
+        sources = regime_sources(rng, paths, labels, block)
+    else:
+        sources = block_sources(rng, paths, days, block)
+    returns = np.take(table, sources + state * days)
+    return path_statistics(returns, np.take(margin, sources))
+
+
+class RobustnessEngine:
+    # Resampled return paths of the strategy from a run's daily sleeve returns. Each sleeve's
+    # return is divided by its allocation from the Rebalance allocation history (forward-filled
+    # onto the days), giving a per-unit return; a path draws source days by circular block
+    # bootstrap ("block") or only from days of the same regime ("regime", with the observed
+    # Recovery/Overheat/Stagflation/Reflation sequence), re-weights their per-unit returns by the
+    # allocation of the path's own day and adds their costs. Paths are simulated as paths x days
+    # matrices `chunk_paths` at a time, across `workers` processes when given; every chunk has
+    # its own seed, so results do not depend on the worker count.
+    def __init__(self, sleeve_returns, allocations, regimes=None, margin_usage=None, block=20):
+        self.dates = pd.DatetimeIndex(sleeve_returns.index)
+        self.sleeves = [name for name in SLEEVES if name in sleeve_returns.columns]
+        returns = sleeve_returns[self.sleeves].to_numpy(dtype=float)
+        self.costs = sleeve_returns["Costs"].to_numpy(dtype=float) if "Costs" in sleeve_returns.columns else np.zeros(len(self.dates))
+        self.allocation = self.allocation_by_day(allocations)
+        self.unit = np.divide(returns, self.allocation, out=np.zeros_like(returns), where=self.allocation > 0)
+        # Rebalance targets take few distinct values: the return of every day under each of them
+        states, self.state = np.unique(self.allocation, axis=0, return_inverse=True)
+        self.state = self.state.reshape(-1)
+        self.table = self.costs + states @ self.unit.T
+        labels = regimes.reindex(self.dates).to_numpy() if regimes is not None else np.full(len(self.dates), REGIMES[0])
+        # Days without a regime label (before the first classification, or missing from the
+        # history) form their own bucket, -1, for the regime bootstrap
+        self.labels = np.array([-1 if pd.isna(label) else REGIMES.index(label) for label in labels], dtype=np.int8)
+        usage = margin_usage.reindex(self.dates).to_numpy(dtype=float) if margin_usage is not None else np.zeros(len(self.dates))
+        # The usage carried into a day is the previous close's
+        self.margin = np.concatenate([usage[:1], usage[:-1]])
+        self.block = block
+
+    @classmethod
+    def from_replay(cls, result, block=20):
+        return cls(result.sleeve_returns, result.allocations, result.regimes, result.margin_usage, block=block)
+
+    def allocation_by_day(self, allocations):
+        # The latest Rebalance target on or before each day; the first one before any was recorded
+        frame = allocations.set_index("Date")[self.sleeves].sort_index() if "Date" in allocations.columns else allocations[self.sleeves].sort_index()
+        if frame.empty:
+            return np.ones((len(self.dates), len(self.sleeves)))
+        rows = np.maximum(np.searchsorted(frame.index.to_numpy(), self.dates.to_numpy(), side="right") - 1, 0)
+        return frame.to_numpy(dtype=float)[rows]
+
+    def observed(self):
+        # Statistics of the path actually taken
+        returns = (self.costs + (self.allocation * self.unit).sum(axis=1))[None, :]
+        return pd.DataFrame(path_statistics(returns, self.margin[None, :])).iloc[0]
+
+    def run(self, paths=10000, method="block", chunk_paths=1000, workers=0, seed=0):
+        # One row of statistics per path
+        if method not in ("block", "regime"):
+            raise ValueError(f"Unknown resampling method: {method}")
+        if paths <= 0:
+            raise ValueError(f"paths must be positive: {paths}")
+        sizes = [min(chunk_paths, paths - start) for start in range(0, paths, chunk_paths)]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        args = [(chunk_seed, size, self.table, self.state, self.margin, self.labels, method, self.block)
+                for chunk_seed, size in zip(seeds, sizes)]
+        workers = os.cpu_count() if workers is None else workers
+        if workers:
+            with ProcessPoolExecutor(workers) as pool:
+                chunks = list(pool.map(simulate_chunk, *zip(*args)))
+        else:
+            chunks = [simulate_chunk(*chunk_args) for chunk_args in args]
+        return pd.DataFrame({name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]})
+
+    def summary(self, statistics):
+        # Quantiles and mean of every statistic, the observed path alongside, and the share of
+        # paths with at least one margin call or breach
+        table = statistics.quantile(QUANTILES).T
+        table.columns = [f"p{int(q * 100)}" for q in QUANTILES]
+        table["mean"] = statistics.mean()
+        table["observed"] = self.observed()
+        table.loc["margin_call_paths", "mean"] = (statistics["margin_calls"] > 0).mean()
+        table.loc["margin_breach_paths", "mean"] = (statistics["margin_breach_days"] > 0).mean()
+        return table
+
+
+if __name__ == "__main__":
+    from replay import ReplayEngine
+    parser = argparse.ArgumentParser(description="Bootstrap the replayed strategy's sleeve returns into a distribution of outcomes")
+    parser.add_argument("asset_csv", help="asset_data.csv (or .pmcol) exported by assets_data.ipynb")
+    parser.add_argument("economic_csv", help="economic_indicators_data.csv (or .pmcol) exported by economic_indicators_data.ipynb")
+    parser.add_argument("--start", default="2020-01-01")
+    parser.add_argument("--end", default="2025-05-29")
+    parser.add_argument("--fee-rate", type=float, default=0.0)
+    parser.add_argument("--slippage", type=float, default=0.0)
+    parser.add_argument("--paths", type=int, default=10000)
+    parser.add_argument("--method", choices=["block", "regime"], default="block")
+    parser.add_argument("--block", type=int, default=20, help="bootstrap block length in days")
+    parser.add_argument("--chunk-paths", type=int, default=1000, help="paths simulated per paths x days matrix")
+    parser.add_argument("--workers", type=int, default=0, help="processes to spread chunks over (0 runs in this process)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--paths-out", help="write the per-path statistics to this csv")
+    args = parser.parse_args()
+    result = ReplayEngine(args.asset_csv, args.economic_csv, datetime.fromisoformat(args.start), datetime.fromisoformat(args.end),
+                          fee_rate=args.fee_rate, slippage=args.slippage).run()
+    engine = RobustnessEngine.from_replay(result, block=args.block)
+    statistics = engine.run(args.paths, args.method, args.chunk_paths, args.workers, args.seed)
+    print(engine.summary(statistics).to_string())
+    if args.paths_out:
+        statistics.to_csv(args.paths_out, index=False)
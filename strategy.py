@@ -0,0 +1,438 @@
+from datetime import timedelta
+import numpy as np
+from bar_store import BarStore, DailyConsolidator
+from execution import ExecutionBatch
+from forex import ForexBasket
+from instrumentation import Instrumentation, DEBUG, INFO
+from pairs import PairsEngine
+from regime import RegimeEngine
+from training import TrainingFeatures, calendar_days, price_arrays, regime_weights, simulate_portfolio, SCORE_BASELINES
+from training_cache import fingerprint
+
+ALLOCATION_COLUMNS = {"Date": "datetime64[s]", "Forex": float, "EquityPair": float, "Bond": float, "Gold": float}
+TRADE_LOG_COLUMNS = {"Date": "datetime64[s]", "Event": object}
+# Sleeve allocations of each regime and sleeve leverage
+ALLOCATIONS = {
+    "Recovery": {"Forex": 0.30, "EquityPair": 0.60, "Bond": 0.05, "Gold": 0.05},  # Adjusted for more EquityPair
+    "Overheat": {"Forex": 0.10, "EquityPair": 0.10, "Bond": 0.40, "Gold": 0.40},
+    "Stagflation": {"Forex": 0.25, "EquityPair": 0.15, "Bond": 0.30, "Gold": 0.30},
+    "Reflation": {"Forex": 0.30, "EquityPair": 0.60, "Bond": 0.05, "Gold": 0.05}
+}
+LEVERAGE = {"Forex": 2.0, "EquityPair": 3.0, "Bond": 1.0, "Gold": 1.0}  # Increased leverage
+
+
+def by_symbol(symbols, values):
+    # Per-symbol values for debug messages; plain floats format far faster than NumPy arrays
+    return dict(zip(symbols, values.tolist()))
+
+
+class MultiPMStrategy:
+    # Signal, risk and allocation logic of the Multi-PM algorithm with no dependency on LEAN.
+    # Everything it needs from the outside world goes through `broker`: price(symbol, default=0),
+    # portfolio_value(), margin_remaining(), invested(symbol), holding_value(symbol),
+    # set_holdings(symbol, weight), liquidate(symbol=None) and debug(message). Sleeves stage
+    # their targets in an ExecutionBatch that places them once per bar (and per rebalance).
+    # Messages, stage timers and counters go through `metrics`, an Instrumentation that defaults
+    # to every message on broker.debug with timing off. main.py wraps a QCAlgorithm in that
+    # interface, replay.py a simulated account. Given a `training_cache`, run_training reuses the
+    # grid results of any earlier run with the same inputs. With a `pairs_universe` of extra
+    # symbols the pairs sleeve screens every pair of NVDA, AMD and the universe and trades up to
+    # `max_pairs` of them; without one it trades NVDA/AMD alone. `forex_basket` adds FX pairs to
+    # the forex sleeve, which otherwise trades the first symbol (EURUSD) alone. At intraday
+    # resolution every bar goes through consolidate(): a DailyConsolidator turns the bars into
+    # the daily bars the signals are computed from, on_data runs once per completed day and
+    # on_bar runs the stops (drawdown, forex ATR, pairs and GLD trailing stops) on every bar in
+    # between.
+    def __init__(self, broker, symbols, time, allocation_history, trade_log, base_drawdown_limit=0.03, atr_multiplier=1.5,
+                 pairs_trailing_stop=0.03, training_score="equity", pairs_universe=(), max_pairs=1, forex_basket=(), metrics=None,
+                 training_cache=None):
+        self.broker = broker
+        self.metrics = metrics or Instrumentation(broker.debug)
+        self.forex, self.nvda, self.amd, self.ief, self.gld, self.vix = symbols
+        self.forex_symbols = [self.forex] + [symbol for symbol in forex_basket if symbol != self.forex]
+        self.pair_symbols = [self.nvda, self.amd] + [symbol for symbol in pairs_universe if symbol not in (self.nvda, self.amd)]
+        self.allocation_history = allocation_history
+        self.trade_log = trade_log
+        # Training and trading periods
+        self.is_training = True
+        self.training_completed = False
+        # State
+        self.previous_cycle = "Recovery"
+        self.gld_high = None
+        self.lookback = 15
+        self.base_drawdown_limit = base_drawdown_limit
+        self.atr_multiplier = atr_multiplier
+        self.pairs_trailing_stop = pairs_trailing_stop
+        # Log-price matrix, z-scores and per-pair position state of the pairs sleeve
+        self.pairs = PairsEngine(self.pair_symbols, self.lookback, pairs=None if len(self.pair_symbols) > 2 else [(self.nvda, self.amd)],
+                                 max_pairs=max_pairs)
+        # Rolling bar cache fed from each slice (warmup included) in place of History calls in OnData
+        self.bars = BarStore([self.forex, self.nvda, self.amd, self.ief, self.gld, self.vix] + self.forex_symbols[1:], self.lookback + 20)
+        # Forex sleeve indicators and positions, evaluated for the whole basket at once
+        self.forex_basket = ForexBasket(self.forex_symbols, self.lookback)
+        # ATR stop distance of each basket pair as of the last daily bar, for the intraday stops
+        self.forex_stop_distance = np.full(len(self.forex_symbols), np.inf)
+        # Daily bars out of intraday ones; unused at daily resolution
+        self.consolidator = DailyConsolidator()
+        self.initial_equity = broker.portfolio_value()
+        self.execution = ExecutionBatch(broker, lambda symbol: self.leverage.get(self.sleeve(symbol), 1.0), metrics=self.metrics)
+        self.trade_count = {"Forex": 0, "Pairs": 0}
+        self.regimes = RegimeEngine(self.previous_cycle)
+        self.drawdown_pause_days = 0
+        self.max_portfolio_leverage = 1.5
+        self.last_trade_time = time
+        self.trade_cooldown = timedelta(days=1)
+        self.rebalance_frequency = 5
+        self.last_rebalance = time
+        # Allocations
+        self.allocations = {name: dict(weights) for name, weights in ALLOCATIONS.items()}
+        self.leverage = dict(LEVERAGE)
+        # Optimization variables
+        self.z_score_entry = 1.0
+        self.momentum_threshold = 0.00007
+        self.simulated_equity = 100000
+        self.best_simulated_equity = 100000
+        # Training ranks combinations by final equity (the original rule), Sharpe or Calmar ratio
+        self.training_score = training_score
+        self.training_cache = training_cache
+        self.best_training_score = SCORE_BASELINES[training_score]
+        self.best_z_score_entry = self.z_score_entry
+        self.best_momentum_threshold = self.momentum_threshold
+        self.z_score_options = [0.8, 1.0, 1.2]
+        self.momentum_options = [0.00005, 0.00007, 0.00009]
+        self.current_params = {"z_score_entry": self.z_score_entry, "momentum_threshold": self.momentum_threshold}
+        self.param_combinations = [(z, m) for z in self.z_score_options for m in self.momentum_options]
+        self.current_combination_index = 0
+        self.simulated_positions = {}
+        self.training_cycle_equity = {}
+
+    def sleeve(self, symbol):
+        return "Forex" if symbol in self.forex_basket.index else "EquityPair" if symbol in self.pairs.index else "Bond" if symbol == self.ief else "Gold"
+
+    def build_regimes(self, dates, vix, ief_close=None):
+        # Regime timeline built once from Economic_Indicators, extended bar by bar past its end
+        self.regimes.build(dates, vix, ief_close)
+
+    def run_training(self, training_start_date, training_end_date, forex_close, vix_value, nvda_close, amd_close):
+        if len(forex_close) == 0 or (vix_value is not None and len(vix_value) == 0) or len(nvda_close) + len(amd_close) == 0:
+            self.metrics.warning("Error: Insufficient historical data for training")
+            self.is_training = False
+            self.training_completed = True
+            return
+        arrays = price_arrays(forex_close, vix_value, nvda_close, amd_close)
+        z_score_entries, momentum_thresholds = np.array(self.param_combinations, dtype=float).T
+        regimes = self.regimes.codes_at(calendar_days(training_start_date, training_end_date))
+        weights = regime_weights(regimes, self.allocations, self.leverage)
+        # Everything the simulation depends on: the training window, the grid, the fixed rule
+        # parameters, the per-day sleeve weights (regimes included) and the price data itself
+        key = fingerprint(training_start_date, training_end_date, self.param_combinations, self.lookback, self.atr_multiplier,
+                          self.pairs_trailing_stop, weights, arrays)
+        portfolio = self.training_cache.get(key) if self.training_cache is not None else None
+        if portfolio is not None:
+            self.metrics.info("Training results loaded from cache (%s)", key[:12])
+        else:
+            days = TrainingFeatures(lookback=self.lookback, **arrays).days(training_start_date, training_end_date)
+            portfolio = simulate_portfolio(days, z_score_entries, momentum_thresholds, self.atr_multiplier, self.pairs_trailing_stop, **weights)
+            if self.training_cache is not None:
+                self.training_cache.put(key, portfolio)
+
+        for (z_score_entry, momentum_threshold), equity, score in zip(self.param_combinations, portfolio.equity, portfolio.score(self.training_score)):
+            self.simulated_equity = float(equity)
+            self.training_cycle_equity[(z_score_entry, momentum_threshold)] = self.simulated_equity
+            if score > self.best_training_score:
+                self.best_training_score = float(score)
+                self.best_simulated_equity = self.simulated_equity
+                self.best_z_score_entry = z_score_entry
+                self.best_momentum_threshold = momentum_threshold
+            self.metrics.debug("Completed simulation for z_score_entry=%s, momentum_threshold=%s, equity=%s, %s=%s",
+                               z_score_entry, momentum_threshold, self.simulated_equity, self.training_score, score)
+
+        self.z_score_entry = self.best_z_score_entry
+        self.momentum_threshold = self.best_momentum_threshold
+        self.current_params = {"z_score_entry": self.z_score_entry, "momentum_threshold": self.momentum_threshold}
+        self.is_training = False
+        self.training_completed = True
+        self.metrics.info("Training complete. Optimized z_score_entry: %s, momentum_threshold: %s", self.z_score_entry, self.momentum_threshold)
+
+    def reset_equity(self, time):
+        if not self.is_training:
+            self.initial_equity = self.broker.portfolio_value()
+            self.trade_log.append({"Date": time, "Event": f"Equity reset: {self.initial_equity}"})
+        else:
+            if self.current_combination_index < len(self.param_combinations):
+                self.simulated_equity = 100000
+                self.simulated_positions = {}
+
+    def update_bars(self, time, values):
+        # `values` maps each symbol present in the slice to its close (or FRED value)
+        started = self.metrics.start()
+        updated = set()
+        for symbol in self.bars.symbols:
+            value = values.get(symbol)
+            if value is None:
+                continue
+            gap = self.bars.update(symbol, time, value)
+            if gap:
+                self.metrics.warning("Data gap for %s: %s days since the previous bar", symbol, gap)
+            updated.add(symbol)
+        self.forex_basket.update(updated, values)
+        if self.nvda in updated and self.amd in updated:
+            self.pairs.update([values.get(symbol, np.nan) for symbol in self.pair_symbols])
+        self.metrics.stop("bars", started)
+        return updated
+
+    def consolidate(self, time, values):
+        # Intraday counterpart of update_bars: feeds the bar to the consolidator and, when it
+        # completes a day, that day's closes to update_bars. Returns the updated symbols then,
+        # None otherwise.
+        completed = self.consolidator.update(time, values)
+        return self.update_bars(*completed) if completed is not None else None
+
+    def on_bar(self, time):
+        # An intraday bar that completes no day: the stops alone, at the bar's prices
+        metrics = self.metrics
+        started = metrics.start()
+        if self.drawdown_pause_days == 0 and not self.drawdown_stop():
+            basket = self.forex_basket
+            if (basket.direction != 0).any():
+                self.forex_stops(np.array([self.broker.price(symbol) for symbol in basket.symbols], dtype=float))
+            if self.pairs.open_pairs:
+                self.pairs_stops()
+            self.gld_stop()
+            self.execution.submit()
+        metrics.stop("stops", started)
+
+    def on_data(self, time, updated):
+        metrics = self.metrics
+        started = metrics.start()
+        self.trade_bar(time, updated)
+        metrics.stop("on_data", started)
+        metrics.bar()
+
+    def trade_bar(self, time, updated):
+        broker = self.broker
+        metrics = self.metrics
+        current_date = time.date()
+        vix_value = broker.price(self.vix, 20)
+        vix_momentum = 0
+        vix_prices = self.bars.window(self.vix, 2)
+        if len(vix_prices) >= 2:
+            vix_momentum = (vix_prices[-1] - vix_prices[-2]) / vix_prices[-2]
+        self.regimes.update(current_date, vix_value, self.bars.latest(self.ief) if self.ief in updated else None)
+
+        if self.drawdown_pause_days > 0:
+            self.drawdown_pause_days -= 1
+            metrics.count("paused_bars")
+            return
+        if self.drawdown_stop():
+            return
+        if broker.margin_remaining() < broker.portfolio_value() * 0.20:
+            metrics.count("margin_skips")
+            metrics.info("Margin too low, skipping trading")
+            return
+        if time < self.last_trade_time + self.trade_cooldown:
+            metrics.count("cooldown_skips")
+            metrics.debug("Trade cooldown active, skipping trading")
+            return
+        cycle = self.regimes.regime_at(current_date)
+        self.trade_forex(time, cycle, vix_momentum, vix_value)
+        self.trade_pairs(time, cycle, vix_momentum, vix_value)
+        self.gld_stop()
+        started = metrics.start()
+        self.execution.submit()
+        metrics.stop("orders", started)
+        self.previous_cycle = cycle
+
+    def drawdown_stop(self):
+        # Liquidates everything and pauses trading for 5 days once equity falls more than
+        # base_drawdown_limit below initial_equity; returns whether it did
+        broker = self.broker
+        current_equity = broker.portfolio_value()
+        drawdown = (self.initial_equity - current_equity) / self.initial_equity
+        if not drawdown > self.base_drawdown_limit:
+            return False
+        self.execution.cancel()
+        broker.liquidate()
+        self.forex_basket.flatten()
+        self.pairs.flatten()
+        self.initial_equity = current_equity
+        self.drawdown_pause_days = 5
+        self.metrics.count("drawdown_liquidations")
+        self.metrics.warning("Drawdown exceeded: %.2f%%, pausing trading for 5 days", drawdown * 100)
+        return True
+
+    def gld_stop(self):
+        gld_price = self.broker.price(self.gld) or self.bars.latest(self.gld)
+        if gld_price != 0 and self.broker.invested(self.gld):
+            self.gld_high = max(self.gld_high or gld_price, gld_price)
+            if gld_price < self.gld_high * 0.97:
+                self.gld_high = None
+                self.execution.liquidate(self.gld)
+                self.metrics.info("GLD position exited: trailing stop triggered")
+
+    def forex_stops(self, price):
+        # ATR stop-loss on the open basket positions, at forex_stop_distance from their entries
+        basket = self.forex_basket
+        for i in basket.stops(price, self.forex_stop_distance):
+            self.execution.liquidate(basket.symbols[i])
+            self.metrics.count("forex_stops")
+            self.metrics.info("Forex stop-loss triggered for %s at price %s", basket.symbols[i], price[i])
+
+    def pairs_stops(self):
+        # Trailing stops of the open pairs at the current prices, between daily bars
+        pairs = self.pairs
+        held = np.flatnonzero(pairs.direction != 0)
+        first, second = pairs.first[held], pairs.second[held]
+        first_price = np.array([self.broker.price(self.pair_symbols[i]) for i in first], dtype=float)
+        second_price = np.array([self.broker.price(self.pair_symbols[i]) for i in second], dtype=float)
+        priced = (first_price != 0) & (second_price != 0)
+        direction = pairs.direction.copy()
+        closed = pairs.stops(held[priced], first_price[priced], second_price[priced], self.pairs_trailing_stop)
+        if not len(closed):
+            return
+        pair_weight = self.allocations[self.previous_cycle]["EquityPair"] * self.leverage["EquityPair"] / 2 / pairs.max_pairs
+        self.trade_pair_targets(pairs.targets(pair_weight, direction), pairs.targets(pair_weight))
+        self.metrics.count("pairs_exits", len(closed))
+        for p in closed:
+            self.metrics.info("Pairs trade exited: trailing stop triggered (%s)", pairs.pair_label(p))
+
+    def trade_forex(self, time, cycle, vix_momentum, vix_value):
+        # The EURUSD rules applied to every pair of the basket at once: ATR stop-loss on open
+        # positions, then momentum entries confirmed by SMA10 vs SMA20 under the volatility limit
+        broker = self.broker
+        metrics = self.metrics
+        basket = self.forex_basket
+        ready = basket.ready()
+        if not ready.any():
+            metrics.debug("Forex data insufficient for trading")
+            return
+        started = metrics.start()
+        momentum, sma_short, sma_long, atr, vol = basket.indicators()
+        started = metrics.stop("indicators", started)
+        price = np.array([broker.price(symbol) or self.bars.latest(symbol) for symbol in basket.symbols], dtype=float)
+        vol_limit = 0.03 if cycle in ["Recovery", "Reflation"] else 0.02
+        self.forex_stop_distance = np.where(ready, self.atr_multiplier * atr, np.inf)
+        flat = basket.direction == 0
+        if not flat.all():
+            self.forex_stops(price)
+            flat = basket.direction == 0
+        if not flat.any():
+            metrics.stop("signals", started)
+            return
+        conditions = ready & flat & (np.abs(momentum) > self.current_params["momentum_threshold"]) & (vol < vol_limit)
+        if not (vix_momentum < 0.15 and vix_value < 50):
+            conditions[:] = False
+        signal = np.where(momentum > 0, sma_short > sma_long, sma_short < sma_long)
+        # The Forex budget is split evenly across the basket
+        weight = self.allocations[cycle]["Forex"] * self.leverage["Forex"] / len(basket)
+        for i in basket.enter(conditions & signal, momentum, price):
+            symbol = basket.symbols[i]
+            self.trade_count["Forex"] += 1
+            self.execution.target(symbol, weight * basket.direction[i])
+            self.last_trade_time = time
+            metrics.info("Forex trade executed: %s %s at price %s", "Long" if basket.direction[i] > 0 else "Short", symbol, price[i])
+        metrics.stop("signals", started)
+        if not metrics.is_enabled(DEBUG):
+            return
+        if (conditions & ~signal).any():
+            metrics.debug("Forex signal not met: sma_short=%s, sma_long=%s, momentum=%s", by_symbol(basket.symbols, sma_short),
+                          by_symbol(basket.symbols, sma_long), by_symbol(basket.symbols, momentum))
+        if (ready & flat & ~conditions).any():
+            metrics.debug("Forex entry conditions not met: momentum=%s, vol=%s, vix_momentum=%s, vix_value=%s",
+                          by_symbol(basket.symbols, momentum), by_symbol(basket.symbols, vol), vix_momentum, vix_value)
+
+    def trade_pairs(self, time, cycle, vix_momentum, vix_value):
+        # The NVDA/AMD rules applied to every open or screened pair at once: exits on the z-score,
+        # near-zero z or trailing stop first, then entries when |z| clears z_score_entry
+        broker = self.broker
+        metrics = self.metrics
+        pairs = self.pairs
+        if pairs.due:
+            started = metrics.start()
+            passing = pairs.screen()
+            metrics.stop("screen", started)
+            if metrics.is_enabled(INFO):
+                metrics.info("Pairs screen: %s of %s pairs cointegrated, trading %s", len(passing), len(pairs.first),
+                             [pairs.pair_label(p) for p in np.flatnonzero(pairs.selected)])
+        active, first, second = pairs.active()
+        prices = np.array([broker.price(symbol) for symbol in self.pair_symbols], dtype=float)
+        first_price, second_price = prices[first], prices[second]
+        priced = (first_price != 0) & (second_price != 0)
+        if not priced.any():
+            metrics.debug("Pairs price data unavailable")
+            return
+        started = metrics.start()
+        spread, z_score, ready = pairs.statistics(first, second)
+        started = metrics.stop("indicators", started)
+        tradable = priced & ready
+        if not tradable.all():
+            if not tradable.any():
+                metrics.debug("Pairs data insufficient for trading")
+                return
+            active, spread, z_score = active[tradable], spread[tradable], z_score[tradable]
+            first_price, second_price = first_price[tradable], second_price[tradable]
+        # One leg weight per pair, the sleeve split evenly over max_pairs
+        pair_weight = self.allocations[cycle]["EquityPair"] * self.leverage["EquityPair"] / 2 / pairs.max_pairs
+        direction = pairs.direction.copy()
+        exits = pairs.exits(active, z_score, first_price, second_price, self.pairs_trailing_stop)
+        if any(len(closed) for closed in exits):
+            self.trade_pair_targets(pairs.targets(pair_weight, direction), pairs.targets(pair_weight))
+            for closed, reason in zip(exits, ["z-score condition met", "z-score near zero", "trailing stop triggered"]):
+                metrics.count("pairs_exits", len(closed))
+                for p in closed:
+                    metrics.info("Pairs trade exited: %s (%s)", reason, pairs.pair_label(p))
+        if pairs.open_pairs >= pairs.max_pairs:
+            metrics.stop("signals", started)
+            return
+        if vix_momentum < 0.15 and vix_value < 50:
+            direction = pairs.direction.copy()
+            opened = pairs.entries(active, z_score, spread, first_price, second_price, self.current_params["z_score_entry"])
+            if len(opened):
+                self.trade_count["Pairs"] += len(opened)
+                self.trade_pair_targets(pairs.targets(pair_weight, direction), pairs.targets(pair_weight))
+                self.last_trade_time = time
+                metrics.stop("signals", started)
+                if metrics.is_enabled(INFO):
+                    for p in opened:
+                        position = "Long" + pairs.symbols[pairs.second[p]] + "Short" + pairs.symbols[pairs.first[p]] if pairs.direction[p] < 0 else \
+                            "Long" + pairs.symbols[pairs.first[p]] + "Short" + pairs.symbols[pairs.second[p]]
+                        metrics.info("Pairs trade executed: %s, z_score=%s", position, z_score[active == p][0])
+                return
+        metrics.stop("signals", started)
+        if metrics.is_enabled(DEBUG) and not (pairs.direction[active] != 0).all():
+            metrics.debug("Pairs entry conditions not met: z_score=%s, vix_momentum=%s, vix_value=%s",
+                          by_symbol(map(pairs.pair_label, active), z_score), vix_momentum, vix_value)
+
+    def trade_pair_targets(self, before, after):
+        # Stages the symbols whose net pairs weight changed
+        for i in np.flatnonzero(after != before):
+            self.execution.target(self.pair_symbols[i], after[i])
+
+    def rebalance(self, time):
+        if (time - self.last_rebalance).days < self.rebalance_frequency:
+            return
+        self.last_rebalance = time
+        cycle = self.previous_cycle
+        target = self.allocations[cycle].copy()
+        vix_value = self.broker.price(self.vix, 20)
+        if vix_value > 30:
+            for k in ["Forex", "EquityPair"]:
+                target[k] *= 0.7
+        total = sum(target.values())
+        for key in target:
+            target[key] /= total
+        if self.broker.price(self.ief) != 0:
+            self.execution.target(self.ief, target["Bond"] * self.leverage["Bond"])
+        if self.broker.price(self.gld) != 0:
+            self.execution.target(self.gld, target["Gold"] * self.leverage["Gold"])
+        started = self.metrics.start()
+        self.execution.submit()
+        self.metrics.stop("orders", started)
+        allocation_record = {
+            "Date": time,
+            "Forex": target["Forex"],
+            "EquityPair": target["EquityPair"],
+            "Bond": target["Bond"],
+            "Gold": target["Gold"]
+        }
+        self.allocation_history.append(allocation_record)
@@ -0,0 +1,195 @@
+import math
+from array import array
+import numpy as np
+
+
+class RingBuffer:
+    __slots__ = ("values", "capacity", "count", "head")
+
+    def __init__(self, capacity):
+        self.values = array("d", bytes(8 * capacity))
+        self.capacity = capacity
+        self.count = 0
+        self.head = 0
+
+    def push(self, value):
+        # Returns the value that fell out of the window, or None while the buffer is filling
+        evicted = self.values[self.head] if self.count == self.capacity else None
+        self.values[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        return evicted
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("ring buffer index out of range")
+        return self.values[(self.head - self.count + i) % self.capacity]
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.values[(self.head - self.count + i) % self.capacity]
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def full(self):
+        return self.count == self.capacity
+
+
+class StreamingBasket:
+    # Momentum, SMA short/long, range ATR and return volatility of a basket of price series,
+    # streamed bar by bar in arrays over the basket, with the definitions the forex sleeve has
+    # always used. Closes are kept as BarStore keeps them, written twice into a zeroed
+    # (series, 2 * capacity) array so every trailing window is one contiguous run and reads
+    # 0.0 before the first bars; the SMAs, the ranges in the ATR window and the returns in the
+    # volatility window are running sums over rings of their own, recomputed from the rings
+    # once per lap of the close ring so rounding cannot accumulate. A bar costs the same
+    # whatever `window` is, the `period`-wide high/low of the newest range aside. While every
+    # update covers the whole basket the series share one head and sample count, and the rings
+    # are read with plain slices. Values are NaN where a series lacks the bars.
+    def __init__(self, size, period, window, short_period=10, long_period=20):
+        self.size = size
+        self.period = period
+        self.short_period = short_period
+        self.long_period = long_period
+        # Closes read back: the newest `span + 1`, enough for the close leaving the longer SMA
+        self.span = max(long_period, period)
+        self.capacity = self.span + 1
+        self.closes = np.zeros((size, 2 * self.capacity))
+        self.heads = np.zeros(size, dtype=np.intp)
+        self.samples = np.zeros(size, dtype=np.intp)
+        self.offsets = np.arange(-self.span, 1)
+        self.short_total = np.zeros(size)
+        self.long_total = np.zeros(size)
+        self.ranges = np.zeros((size, window - period + 1))
+        self.range_total = np.zeros(size)
+        self.returns = np.zeros((size, period))
+        self.return_total = np.zeros(size)
+        self.return_squares = np.zeros(size)
+        self.last = np.full(size, np.nan)
+        self.base = np.full(size, np.nan)
+        # Shared head and sample count while every update has covered every series
+        self.aligned = True
+        self.head = 0
+        self.count = 0
+
+    def update(self, rows, prices):
+        # New closes `prices` of the series `rows` (distinct indices), or of all of them in order
+        # when `rows` is None
+        if rows is None:
+            if self.aligned:
+                return self.update_aligned(prices)
+            rows = np.arange(self.size)
+        if self.aligned:
+            self.aligned = False
+            self.samples[:] = self.count
+            self.heads[:] = self.head
+        self.update_rows(rows, prices)
+
+    def update_aligned(self, prices):
+        # update() of the whole basket while the series share one head and sample count, which
+        # stand in for `heads` and `samples` until the first partial update
+        head, capacity, span, period = self.head, self.capacity, self.span, self.period
+        self.count = samples = self.count + 1
+        self.head = (head + 1) % capacity
+        closes = self.closes
+        closes[:, head] = closes[:, head + capacity] = prices
+        window = closes[:, head + capacity - span:head + capacity + 1]
+        self.short_total += prices - window[:, span - self.short_period]
+        self.long_total += prices - window[:, span - self.long_period]
+        self.last[:] = prices
+        self.base[:] = window[:, span + 1 - period]
+        if samples >= period:
+            value = np.ptp(window[:, -period:], axis=1)
+            slot = (samples - period) % self.ranges.shape[1]
+            self.range_total += value - self.ranges[:, slot]
+            self.ranges[:, slot] = value
+        if samples >= 2:
+            value = prices / window[:, -2] - 1
+            slot = (samples - 2) % period
+            evicted = self.returns[:, slot]
+            self.return_total += value - evicted
+            self.return_squares += value * value - evicted * evicted
+            self.returns[:, slot] = value
+        if head == capacity - 1:
+            self.resync(slice(None), window)
+
+    def update_rows(self, rows, prices):
+        capacity = self.capacity
+        samples = self.samples[rows] + 1
+        self.samples[rows] = samples
+        heads = self.heads[rows]
+        self.closes[rows, heads] = self.closes[rows, heads + capacity] = prices
+        self.heads[rows] = (heads + 1) % capacity
+        window = self.closes[rows[:, None], (heads + capacity)[:, None] + self.offsets]
+        self.advance(rows, window, prices)
+        # Only the series with enough bars get a range or a return
+        ranged = samples >= self.period
+        if ranged.any():
+            self.push_range(rows[ranged], (samples[ranged] - self.period) % self.ranges.shape[1], window[ranged, -self.period:])
+        returned = samples >= 2
+        if returned.any():
+            self.push_return(rows[returned], (samples[returned] - 2) % self.period, prices[returned] / window[returned, -2] - 1)
+        lapped = heads == capacity - 1
+        if lapped.any():
+            self.resync(rows[lapped], window[lapped])
+
+    def advance(self, rows, window, prices):
+        # `window` holds each series' newest `span + 1` closes, oldest first
+        span = self.span
+        self.short_total[rows] += prices - window[:, span - self.short_period]
+        self.long_total[rows] += prices - window[:, span - self.long_period]
+        self.last[rows] = prices
+        self.base[rows] = window[:, span + 1 - self.period]
+
+    def push_range(self, rows, slots, closes):
+        value = np.ptp(closes, axis=1)
+        self.range_total[rows] += value - self.ranges[rows, slots]
+        self.ranges[rows, slots] = value
+
+    def push_return(self, rows, slots, value):
+        evicted = self.returns[rows, slots]
+        self.return_total[rows] += value - evicted
+        self.return_squares[rows] += value * value - evicted * evicted
+        self.returns[rows, slots] = value
+
+    def resync(self, rows, window):
+        recent = window[:, -self.long_period:]
+        self.long_total[rows] = recent.sum(axis=1)
+        self.short_total[rows] = recent[:, -self.short_period:].sum(axis=1)
+        self.range_total[rows] = self.ranges[rows].sum(axis=1)
+        returns = self.returns[rows]
+        self.return_total[rows] = returns.sum(axis=1)
+        self.return_squares[rows] = (returns * returns).sum(axis=1)
+
+    def sample_counts(self):
+        return np.full(self.size, self.count) if self.aligned else self.samples
+
+    def values(self):
+        # (momentum, sma_short, sma_long, atr, vol) per series
+        if self.aligned:
+            samples = self.count
+            if samples >= self.span:
+                # Past warm-up: every value is defined
+                mean = self.return_total / self.period
+                variance = self.return_squares / self.period - mean * mean
+                return ((self.last - self.base) / self.base, self.short_total / self.short_period, self.long_total / self.long_period,
+                        self.range_total / (min(samples - self.period + 1, self.ranges.shape[1]) * self.last),
+                        np.sqrt(np.maximum(variance, 0.0)) * math.sqrt(252))
+        samples = self.sample_counts()
+        nan = np.full(self.size, np.nan)
+        ready = samples >= self.period
+        momentum = np.divide(self.last - self.base, self.base, out=nan.copy(), where=ready)
+        sma_short = np.where(samples >= self.short_period, self.short_total / self.short_period, np.nan)
+        sma_long = np.where(samples >= self.long_period, self.long_total / self.long_period, np.nan)
+        ranges = np.minimum(samples - self.period + 1, self.ranges.shape[1])
+        atr = np.divide(self.range_total, ranges * self.last, out=nan.copy(), where=ready)
+        count = np.minimum(samples - 1, self.period)
+        mean = np.divide(self.return_total, count, out=nan.copy(), where=count > 0)
+        variance = self.return_squares / np.maximum(count, 1) - mean * mean
+        vol = np.sqrt(np.maximum(variance, 0.0)) * math.sqrt(252)
+        return momentum, sma_short, sma_long, atr, vol
@@ -0,0 +1,115 @@
+import pytest
+from execution import ExecutionBatch
+
+PORTFOLIO_VALUE = 100000.0
+
+
+class Broker:
+    # Holdings as weights of a fixed portfolio value; every order is recorded and applied
+    def __init__(self, holdings=None, margin=PORTFOLIO_VALUE):
+        self.holdings = dict(holdings or {})
+        self.margin = margin
+        self.orders = []
+
+    def debug(self, message):
+        pass
+
+    def portfolio_value(self):
+        return PORTFOLIO_VALUE
+
+    def holding_value(self, symbol):
+        return self.holdings.get(symbol, 0.0) * PORTFOLIO_VALUE
+
+    def margin_remaining(self):
+        return self.margin
+
+    def set_holdings(self, symbol, weight):
+        self.orders.append((symbol, weight))
+        self.holdings[symbol] = weight
+
+    def liquidate(self, symbol):
+        self.orders.append((symbol, 0))
+        self.holdings[symbol] = 0.0
+
+
+def batch(broker, leverage=1.0):
+    return ExecutionBatch(broker, lambda symbol: leverage)
+
+
+def test_repeated_targets_net_to_one_order():
+    broker = Broker({"EURUSD": 0.2})
+    execution = batch(broker)
+    execution.liquidate("EURUSD")
+    execution.target("EURUSD", 0.5)
+    execution.target("NVDA", 0.1)
+    execution.target("NVDA", 0.3)
+    assert len(execution) == 2
+    assert execution.submit() == [("EURUSD", 0.5), ("NVDA", 0.3)]
+    assert broker.orders == [("EURUSD", 0.5), ("NVDA", 0.3)]
+    assert len(execution) == 0 and execution.submit() == []
+
+
+def test_short_margin_scales_only_the_increases():
+    broker = Broker({"EURUSD": 0.5, "NVDA": -0.3, "AMD": 0.2}, margin=-10000)
+    execution = batch(broker)
+    execution.target("EURUSD", 0.8)
+    execution.target("NVDA", -0.1)
+    execution.liquidate("AMD")
+    execution.target("GLD", 0.3)
+    orders = dict(execution.submit())
+    # 90k of buying power, 85.5k after the buffer: 60k keeps EURUSD and the NVDA reduction, the
+    # other 25.5k covers 0.425 of the 60k of increases
+    assert orders["NVDA"] == -0.1
+    assert orders["AMD"] == 0
+    assert orders["EURUSD"] == pytest.approx(0.5 + 0.425 * 0.3)
+    assert orders["GLD"] == pytest.approx(0.425 * 0.3)
+    assert execution.scaled == 1
+
+
+def test_no_buying_power_keeps_held_positions():
+    broker = Broker({"EURUSD": 0.5, "NVDA": -0.3, "AMD": 0.2}, margin=-200000)
+    execution = batch(broker)
+    execution.target("EURUSD", 0.8)
+    execution.target("NVDA", -0.1)
+    execution.liquidate("AMD")
+    execution.target("GLD", 0.3)
+    # EURUSD stays as held and GLD is not opened; the reduction and the close still go out
+    assert execution.submit() == [("AMD", 0.0), ("NVDA", -0.1)]
+    assert broker.holdings == {"EURUSD": 0.5, "NVDA": -0.1, "AMD": 0.0}
+
+
+def test_flip_is_an_increase_from_flat():
+    broker = Broker({"EURUSD": 0.4, "NVDA": 0.2})
+    execution = batch(broker)
+    execution.target("EURUSD", -0.4)
+    execution.target("NVDA", 0.1)
+    # Flips through zero go out with the increases, after the reductions
+    assert execution.submit() == [("NVDA", 0.1), ("EURUSD", -0.4)]
+    assert execution.scaled == 0
+
+    broker = Broker({"EURUSD": 0.4}, margin=-30000)
+    execution = batch(broker)
+    execution.target("EURUSD", -0.4)
+    # 10k of buying power, 9.5k after the buffer: none of the flip is held, so it is scaled from flat
+    assert execution.submit() == [("EURUSD", pytest.approx(-0.095))]
+
+
+def test_unchanged_targets_are_skipped():
+    broker = Broker({"EURUSD": 0.5})
+    execution = batch(broker)
+    execution.target("EURUSD", 0.5)
+    execution.liquidate("NVDA")
+    assert execution.submit() == []
+    assert broker.orders == []
+
+
+def test_orders_go_out_closes_then_reductions_then_increases():
+    broker = Broker({"NVDA": 0.3, "AMD": -0.3, "IEF": 0.1})
+    execution = batch(broker)
+    execution.target("EURUSD", 0.4)
+    execution.target("AMD", -0.1)
+    execution.target("GLD", 0.05)
+    execution.liquidate("NVDA")
+    execution.target("IEF", 0.2)
+    execution.liquidate("IEF")
+    assert [symbol for symbol, _ in execution.submit()] == ["NVDA", "IEF", "AMD", "EURUSD", "GLD"]
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+from regime import REGIMES, RegimeEngine
+
+
+class DetermineCycle:
+    # The original DetermineCycle, with previous_cycle set to each result as Rebalance did and
+    # History(self.ief, 20) as the last 20 IEF closes
+    def __init__(self):
+        self.previous_cycle = "Recovery"
+        self.cycle_confirm_days = 0
+        self.cycle_candidate = "Recovery"
+
+    def determine(self, vix_value, ief_prices):
+        vix = vix_value
+        ief_ret = 0
+        if len(ief_prices) and len(ief_prices) >= 20 * 24:
+            ief_ret = (ief_prices[-1] - ief_prices[-20 * 24]) / ief_prices[-20 * 24]
+        if vix > 35:
+            self.cycle_confirm_days = 0
+            return "Stagflation"
+        new_cycle = self.previous_cycle
+        if ief_ret > 0 and vix < 15:
+            new_cycle = "Recovery"
+        elif ief_ret < 0.02 and vix > 25:
+            new_cycle = "Overheat"
+        elif ief_ret < 0 and vix > 30:
+            new_cycle = "Stagflation"
+        elif ief_ret > 0 and vix <= 20:
+            new_cycle = "Reflation"
+        if new_cycle == self.cycle_candidate:
+            self.cycle_confirm_days += 1
+            if self.cycle_confirm_days >= 5:
+                return new_cycle
+        else:
+            self.cycle_candidate = new_cycle
+            self.cycle_confirm_days = 1
+        return self.previous_cycle
+
+    def __call__(self, vix_value, ief_prices):
+        self.previous_cycle = self.determine(vix_value, ief_prices)
+        return self.previous_cycle
+
+
+def economic_data(days=400, seed=3):
+    # VIX in runs of 1-8 business days across quiet (NO_SIGNAL), Overheat, crisis and missing
+    # values, so confirmations complete, get interrupted and get reset
+    rng = np.random.default_rng(seed)
+    levels = [12.0, 18.0, 22.0, 28.0, 33.0, 40.0, np.nan]
+    vix = np.concatenate([np.full(rng.integers(1, 9), rng.choice(levels)) for _ in range(days)])[:days]
+    dates = pd.bdate_range("2019-01-01", periods=days)
+    ief = pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.003, days))), index=dates)
+    return dates, vix, ief
+
+
+def reference_regimes(dates, vix, ief):
+    cycle = DetermineCycle()
+    return [cycle(value, ief[ief.index <= date].to_numpy()[-20:]) for date, value in zip(dates, vix)]
+
+
+def test_build_matches_determine_cycle():
+    dates, vix, ief = economic_data()
+    expected = reference_regimes(dates, vix, ief)
+    assert {"Overheat", "Stagflation"} <= set(expected)
+
+    engine = RegimeEngine()
+    engine.build(dates, vix, ief)
+    assert [engine.regime_at(date) for date in dates] == expected
+    # Calendar days between evaluations keep the regime of the last one
+    days = np.arange(np.datetime64(dates[0].date()), np.datetime64(dates[-1].date()) + 1)
+    last = np.searchsorted(np.array(dates, dtype="datetime64[D]"), days, side="right") - 1
+    np.testing.assert_array_equal(engine.codes_at(days), [REGIMES.index(expected[i]) for i in last])
+
+
+def test_lookups_before_the_start_return_the_initial_regime():
+    dates, vix, ief = economic_data()
+    engine = RegimeEngine("Reflation")
+    engine.build(dates, vix, ief)
+    before = np.arange(np.datetime64(dates[0].date()) - 10, np.datetime64(dates[0].date()))
+    assert engine.regime_at(dates[0] - pd.Timedelta(days=1)) == "Reflation"
+    np.testing.assert_array_equal(engine.codes_at(before), REGIMES.index("Reflation"))
+
+
+def test_update_past_the_built_range_continues_determine_cycle():
+    dates, vix, ief = economic_data()
+    expected = reference_regimes(dates, vix, ief)
+    built = 250
+    engine = RegimeEngine()
+    engine.build(dates[:built], vix[:built], ief[:built])
+    # Live bars inside the built range only fill the IEF window
+    for date in ief.index[built - 20:built]:
+        engine.update(date, vix[dates.get_loc(date)], ief[date])
+    # Dates inside the built range are answered from the timeline without another evaluation
+    assert engine.regime_at(dates[built - 1]) == expected[built - 1]
+    for i in range(built, len(dates)):
+        assert engine.update(dates[i], vix[i], ief.iloc[i]) == expected[i]
+        assert engine.regime_at(dates[i]) == expected[i]
+    assert [engine.regime_at(date) for date in dates] == expected
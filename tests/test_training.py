@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+from training import FOREX, INITIAL_EQUITY, SimulatedPortfolio, TrainingFeatures, simulate_portfolio
+
+LOOKBACK = 15
+Z_SCORE_OPTIONS = [0.8, 1.0, 1.2]
+MOMENTUM_OPTIONS = [0.00005, 0.00007, 0.00009]
+# Recovery weights of the default allocations and leverage
+FOREX_WEIGHT = 0.3 * 2.0
+PAIR_WEIGHT = 0.3 * 3.0 / 2
+VOL_LIMIT = 0.03
+
+
+def market(days=260, seed=7):
+    # Low-volatility EURUSD, a mean-reverting NVDA/AMD spread and a calm VIX, so every sleeve trades
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2020-01-01", periods=days)
+    forex = pd.Series(1.1 * np.exp(np.cumsum(rng.normal(0, 0.0008, days))), index=dates)
+    amd = pd.Series(80 * np.exp(np.cumsum(rng.normal(0, 0.01, days))), index=dates)
+    spread = np.zeros(days)
+    for t in range(1, days):
+        spread[t] = 0.8 * spread[t - 1] + rng.normal(0, 0.02)
+    nvda = pd.Series(amd.to_numpy() * np.exp(0.3 + spread), index=dates)
+    vix = pd.Series(18 + np.cumsum(rng.normal(0, 0.2, days)), index=dates)
+    return forex, vix, nvda, amd
+
+
+def momentum(prices, period):
+    if len(prices) < period:
+        return 0
+    return (prices.iloc[-1] - prices.iloc[-period]) / prices.iloc[-period]
+
+
+def atr(prices, period):
+    if len(prices) < period:
+        return 0.01
+    return (prices.rolling(period).max() - prices.rolling(period).min()).mean() / prices.iloc[-1]
+
+
+def volatility(prices, period):
+    if len(prices) < period:
+        return 0
+    returns = prices.pct_change().dropna()
+    return np.std(returns[-period:]) * np.sqrt(252)
+
+
+def spread_statistics(prices1, prices2, period):
+    log_spread = np.log(prices1) - np.log(prices2)
+    return log_spread.iloc[-1], np.mean(log_spread[-period:]), np.std(log_spread[-period:])
+
+
+def reference_equity(forex, vix, nvda, amd, start, end, z_score_entry, momentum_threshold, atr_multiplier=1.5, pairs_trailing_stop=0.03):
+    # The per-combination RunTraining loop training.py replaced, with the position flags reset
+    # for every combination
+    equity = INITIAL_EQUITY
+    positions = {}
+    forex_position = forex_entry_price = pairs_position = None
+    spread_high = nvda_high = amd_high = None
+
+    def revalue(current_date):
+        value = INITIAL_EQUITY
+        for symbol, (weight, entry_price) in positions.items():
+            prices = {"forex": forex, "nvda": nvda, "amd": amd}[symbol]
+            price = prices[prices.index.date <= current_date].iloc[-1]
+            value += weight * equity * (1 + (price - entry_price) / entry_price)
+        return value
+
+    for day in pd.date_range(start, end):
+        current_date = day.date()
+        vix_slice = vix[vix.index.date <= current_date].tail(2)
+        vix_value = vix_slice.iloc[-1] if not vix_slice.empty else 20
+        vix_momentum = (vix_slice.iloc[-1] - vix_slice.iloc[-2]) / vix_slice.iloc[-2] if len(vix_slice) >= 2 else 0
+
+        prices = forex[forex.index.date <= current_date].tail(LOOKBACK + 20)
+        if len(prices) >= LOOKBACK:
+            forex_momentum = momentum(prices, LOOKBACK)
+            forex_price = prices.iloc[-1]
+            if forex_position and forex_entry_price:
+                if abs(forex_price - forex_entry_price) / forex_entry_price >= atr_multiplier * atr(prices, LOOKBACK):
+                    positions.pop("forex", None)
+                    forex_position = forex_entry_price = None
+            if (forex_position is None and abs(forex_momentum) > momentum_threshold and volatility(prices, LOOKBACK) < VOL_LIMIT
+                    and vix_momentum < 0.15 and vix_value < 50):
+                sma_short = prices.rolling(10).mean().iloc[-1]
+                sma_long = prices.rolling(20).mean().iloc[-1]
+                if sma_short > sma_long if forex_momentum > 0 else sma_short < sma_long:
+                    forex_position = "Long" if forex_momentum > 0 else "Short"
+                    forex_entry_price = forex_price
+                    positions["forex"] = (FOREX_WEIGHT * (1.0 if forex_position == "Long" else -1.0), forex_price)
+                    equity = revalue(current_date)
+
+        nvda_prices = nvda[nvda.index.date <= current_date].tail(LOOKBACK + 20)
+        amd_prices = amd[amd.index.date <= current_date].tail(LOOKBACK + 20)
+        if len(nvda_prices) >= LOOKBACK and len(amd_prices) >= LOOKBACK:
+            nvda_price = nvda_prices.iloc[-1]
+            amd_price = amd_prices.iloc[-1]
+            spread, mean, std = spread_statistics(nvda_prices, amd_prices, LOOKBACK)
+            z_score = (spread - mean) / std if std != 0 else 0
+            spread_vol = volatility(pd.Series(spread, index=nvda_prices.index), LOOKBACK)
+            if pairs_position:
+                spread_high = max(spread_high or abs(z_score), abs(z_score))
+                nvda_high = max(nvda_high or nvda_price, nvda_price)
+                amd_high = max(amd_high or amd_price, amd_price)
+                if abs(z_score) > 3 or abs(z_score) < spread_high * 0.95 or abs(z_score) < 0.05:
+                    positions.pop("nvda", None)
+                    positions.pop("amd", None)
+                    pairs_position = spread_high = nvda_high = amd_high = None
+                    equity = revalue(current_date)
+                elif nvda_price < nvda_high * (1 - pairs_trailing_stop) or amd_price < amd_high * (1 - pairs_trailing_stop):
+                    positions.pop("nvda", None)
+                    positions.pop("amd", None)
+                    pairs_position = nvda_high = amd_high = None
+                    equity = revalue(current_date)
+            if pairs_position is None and abs(z_score) > z_score_entry and spread_vol < 1.5 and vix_momentum < 0.15 and vix_value < 50:
+                pairs_position = "LongAMDShortNVDA" if z_score > z_score_entry else "LongNVDAShortAMD"
+                nvda_high = nvda_price
+                amd_high = amd_price
+                nvda_weight = PAIR_WEIGHT if pairs_position == "LongNVDAShortAMD" else -PAIR_WEIGHT
+                positions["nvda"] = (nvda_weight, nvda_price)
+                positions["amd"] = (-nvda_weight, amd_price)
+                equity = revalue(current_date)
+    return equity
+
+
+def test_vectorized_grid_matches_reference_loop():
+    forex, vix, nvda, amd = market()
+    start, end = forex.index[40], forex.index[-1]
+    grid = [(z, m) for z in Z_SCORE_OPTIONS for m in MOMENTUM_OPTIONS]
+    expected = np.array([reference_equity(forex, vix, nvda, amd, start, end, z, m) for z, m in grid])
+
+    days = TrainingFeatures.from_series(forex, vix, nvda, amd, LOOKBACK).days(start, end)
+    z_score_entries, momentum_thresholds = np.array(grid).T
+    portfolio = simulate_portfolio(days, z_score_entries, momentum_thresholds, 1.5, 0.03, FOREX_WEIGHT, PAIR_WEIGHT, VOL_LIMIT)
+
+    assert len(np.unique(expected)) > 1
+    np.testing.assert_allclose(portfolio.equity, expected, rtol=1e-9)
+    # RunTraining keeps the first combination with the highest equity
+    assert grid[int(np.argmax(portfolio.score("equity")))] == grid[int(np.argmax(expected))]
+
+
+def test_zero_pnl_round_trip_keeps_the_curve_flat():
+    portfolio = SimulatedPortfolio(1, 4)
+    rows = np.array([True])
+    marks = np.array([1.1, np.nan, np.nan])
+    portfolio.record(0, marks)
+    portfolio.open(rows, FOREX, 1.0, FOREX_WEIGHT, 1.1, marks)
+    portfolio.book(rows, marks)
+    portfolio.record(1, marks)
+    portfolio.close(rows, [FOREX], marks)
+    portfolio.book(rows, marks)
+    portfolio.record(2, marks)
+    portfolio.record(3, marks)
+
+    np.testing.assert_array_equal(portfolio.curve[:, 0], INITIAL_EQUITY)
+    assert portfolio.max_drawdown()[0] == 0
+    assert portfolio.score("final_equity")[0] == INITIAL_EQUITY
+    assert portfolio.sharpe()[0] == 0
+    # The booked equity keeps UpdateSimulatedEquity's revaluation for the "equity" score
+    assert portfolio.equity[0] == INITIAL_EQUITY
+
+
+def test_curve_marks_the_pnl_of_open_and_closed_legs():
+    portfolio = SimulatedPortfolio(1, 2)
+    rows = np.array([True])
+    portfolio.open(rows, FOREX, -1.0, FOREX_WEIGHT, 1.0, np.array([1.0, np.nan, np.nan]))
+    assert portfolio.record(0, np.array([0.99, np.nan, np.nan]))[0] == INITIAL_EQUITY * (1 + FOREX_WEIGHT * 0.01)
+    portfolio.close(rows, [FOREX], np.array([0.99, np.nan, np.nan]))
+    assert portfolio.record(1, np.array([1.2, np.nan, np.nan]))[0] == INITIAL_EQUITY * (1 + FOREX_WEIGHT * 0.01)
+    assert portfolio.score("final_equity")[0] == portfolio.curve[-1, 0]
@@ -0,0 +1,345 @@
+import warnings
+import numpy as np
+import pandas as pd
+from regime import REGIMES
+
+INITIAL_EQUITY = 100000
+
+
+def to_days(index):
+    return np.array(index.date, dtype="datetime64[D]")
+
+
+def calendar_days(start_date, end_date):
+    return np.arange(np.datetime64(start_date.date()), np.datetime64(end_date.date()) + 1)
+
+
+def last_index(dates, days):
+    # Position of the last bar dated on or before each day, -1 when there is none yet
+    return np.searchsorted(dates, days, side="right") - 1
+
+
+def price_arrays(forex_close, vix_value, nvda_close, amd_close):
+    # NVDA/AMD are inner-joined so both legs share one date axis
+    pairs = pd.concat([nvda_close.rename("nvda"), amd_close.rename("amd")], axis=1, join="inner")
+    return {
+        "forex_dates": to_days(forex_close.index),
+        "forex_close": forex_close.to_numpy(dtype=float),
+        "vix_dates": to_days(vix_value.index) if vix_value is not None else np.array([], dtype="datetime64[D]"),
+        "vix_value": vix_value.to_numpy(dtype=float) if vix_value is not None else np.array([]),
+        "pairs_dates": to_days(pairs.index),
+        "nvda_close": pairs["nvda"].to_numpy(dtype=float),
+        "amd_close": pairs["amd"].to_numpy(dtype=float),
+    }
+
+
+def trailing_windows(values, window):
+    # Row i holds the `window` values ending at bar i, NaN-padded before the first bar
+    if len(values) == 0:
+        return np.empty((0, window))
+    padded = np.concatenate([np.full(window - 1, np.nan), values])
+    return np.lib.stride_tricks.sliding_window_view(padded, window)
+
+
+def nan_reduce(func, windows):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return func(windows, axis=1)
+
+
+class TrainingFeatures:
+    # Per-bar indicator arrays: the live forex and pairs formulas applied to the trailing
+    # `lookback + 20` bar slice RunTraining used to rebuild every day.
+    def __init__(self, forex_dates, forex_close, vix_dates, vix_value, pairs_dates, nvda_close, amd_close, lookback):
+        self.lookback = int(lookback)
+        self.window = self.lookback + 20
+        self.forex_dates = forex_dates
+        self.forex_close = forex_close
+        self.vix_dates = vix_dates
+        self.vix_value = vix_value
+        self.pairs_dates = pairs_dates
+        self.nvda_close = nvda_close
+        self.amd_close = amd_close
+        self.compute_forex()
+        self.compute_pairs()
+
+    @classmethod
+    def from_series(cls, forex_close, vix_value, nvda_close, amd_close, lookback):
+        return cls(lookback=lookback, **price_arrays(forex_close, vix_value, nvda_close, amd_close))
+
+    def compute_forex(self):
+        prices = self.forex_close
+        period = self.lookback
+        count = len(prices)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.momentum = np.full(count, np.nan)
+            self.momentum[period - 1:] = (prices[period - 1:] - prices[:count - period + 1]) / prices[:count - period + 1]
+            self.sma_short = nan_reduce(np.mean, trailing_windows(prices, 10))
+            self.sma_long = nan_reduce(np.mean, trailing_windows(prices, 20))
+            ranges = np.full(count, np.nan)
+            if count >= period:
+                rolling = np.lib.stride_tricks.sliding_window_view(prices, period)
+                ranges[period - 1:] = rolling.max(axis=1) - rolling.min(axis=1)
+            self.atr = nan_reduce(np.nanmean, trailing_windows(ranges, self.window - period + 1)) / prices
+            returns = np.full(count, np.nan)
+            returns[1:] = prices[1:] / prices[:-1] - 1
+            self.volatility = nan_reduce(np.nanstd, trailing_windows(returns, period)) * np.sqrt(252)
+
+    def compute_pairs(self):
+        period = self.lookback
+        with np.errstate(divide="ignore", invalid="ignore"):
+            spread = np.log(self.nvda_close) - np.log(self.amd_close)
+            windows = trailing_windows(spread, period)
+            mean = nan_reduce(np.nanmean, windows)
+            std = nan_reduce(np.nanstd, windows)
+            self.z_score = np.where(std != 0, (spread - mean) / std, 0.0)
+            # Annualized return volatility of a series filled with the latest spread, which is how
+            # the pairs filter has always measured it: 0 for any finite non-zero spread, NaN otherwise
+            self.spread_vol = np.where(np.isfinite(spread) & (spread != 0), 0.0, np.nan)
+
+    def days(self, start_date, end_date):
+        return TrainingDays(self, calendar_days(start_date, end_date))
+
+
+class TrainingDays:
+    # Features gathered onto the calendar days RunTraining steps through
+    def __init__(self, features, days):
+        self.days = days
+        fx = last_index(features.forex_dates, days)
+        self.forex_ready = fx >= features.lookback - 1
+        fx = np.maximum(fx, 0)
+        self.forex_price = self.take(features.forex_close, fx)
+        self.momentum = self.take(features.momentum, fx)
+        self.sma_short = self.take(features.sma_short, fx)
+        self.sma_long = self.take(features.sma_long, fx)
+        self.atr = self.take(features.atr, fx)
+        self.volatility = self.take(features.volatility, fx)
+
+        pi = last_index(features.pairs_dates, days)
+        self.pairs_ready = pi >= features.lookback - 1
+        pi = np.maximum(pi, 0)
+        self.nvda_price = self.take(features.nvda_close, pi)
+        self.amd_price = self.take(features.amd_close, pi)
+        self.z_score = self.take(features.z_score, pi)
+        self.spread_vol = self.take(features.spread_vol, pi)
+        # Day x SYMBOLS close matrix the simulated portfolio is marked against
+        self.closes = np.column_stack([self.forex_price, self.nvda_price, self.amd_price])
+
+        vi = last_index(features.vix_dates, days)
+        values = features.vix_value
+        self.vix_value = np.where(vi >= 0, self.take(values, np.maximum(vi, 0)), 20.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            previous = self.take(values, np.maximum(vi - 1, 0))
+            self.vix_momentum = np.where(vi >= 1, (self.vix_value - previous) / previous, 0.0)
+
+    def take(self, values, positions):
+        if len(values) == 0:
+            return np.full(len(positions), np.nan)
+        return values[positions]
+
+    def __len__(self):
+        return len(self.days)
+
+
+SYMBOLS = ["EURUSD", "NVDA", "AMD"]
+FOREX, NVDA, AMD = range(len(SYMBOLS))
+# Score of a combination that never trades; RunTraining only adopts a combination that beats it
+SCORE_BASELINES = {"equity": float(INITIAL_EQUITY), "final_equity": float(INITIAL_EQUITY), "sharpe": 0.0, "calmar": 0.0}
+
+
+class SimulatedPortfolio:
+    # Simulated positions of K parameter combinations over the SYMBOLS columns of a day x symbol
+    # close matrix. Direction, size and entry price are (K, symbols) arrays, so marking every
+    # combination is one matrix-vector product. `equity` is the booked simulated_equity, revalued
+    # on entries and exits as UpdateSimulatedEquity did. That revaluation counts each open leg's
+    # notional rather than its P&L, so `curve`, the value at each day's close, is marked from
+    # `capital` instead: cash after the P&L of closed legs, plus each open leg's notional (its
+    # weight of the marked value when it opened) times its return since entry.
+    def __init__(self, combinations, days, symbols=len(SYMBOLS)):
+        self.direction = np.zeros((combinations, symbols))
+        self.size = np.zeros((combinations, symbols))
+        self.entry = np.full((combinations, symbols), np.nan)
+        self.notional = np.zeros((combinations, symbols))
+        self.equity = np.full(combinations, float(INITIAL_EQUITY))
+        self.capital = np.full(combinations, float(INITIAL_EQUITY))
+        self.curve = np.full((days, combinations), float(INITIAL_EQUITY))
+
+    def exposure(self):
+        # Units of mark per unit of booked equity; the legacy valuation of a leg is
+        # direction * size * equity * mark / entry
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.direction != 0, self.direction * self.size / self.entry, 0.0)
+
+    def legacy_value(self, marks, rows=slice(None)):
+        marks = np.where(np.isnan(marks), 0.0, marks)
+        return INITIAL_EQUITY + self.equity[rows] * (self.exposure()[rows] @ marks)
+
+    def pnl(self, marks, rows=slice(None)):
+        # Per-leg P&L since entry; a leg without a mark counts none
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pnl = self.notional[rows] * (marks / self.entry[rows] - 1)
+        return np.where(np.isfinite(pnl), pnl, 0.0)
+
+    def value(self, marks, rows=slice(None)):
+        return self.capital[rows] + self.pnl(marks, rows).sum(axis=1)
+
+    def open(self, rows, column, direction, size, price, marks):
+        # Opens `column` on the rows of mask `rows` at `size` of their marked value
+        self.notional[rows, column] = direction * size * self.value(marks, rows)
+        self.direction[rows, column] = direction
+        self.size[rows, column] = size
+        self.entry[rows, column] = price
+
+    def close(self, rows, columns, marks):
+        # Realizes the P&L of `columns` on the rows of mask `rows` into capital and clears them
+        legs = np.ix_(rows, columns)
+        self.capital[rows] += self.pnl(marks, rows)[:, columns].sum(axis=1)
+        self.direction[legs] = 0
+        self.entry[legs] = np.nan
+        self.notional[legs] = 0
+
+    def book(self, rows, marks):
+        self.equity[rows] = self.legacy_value(marks, rows)
+
+    def record(self, t, marks):
+        self.curve[t] = self.value(marks)
+        return self.curve[t]
+
+    def returns(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.curve[1:] / self.curve[:-1] - 1
+
+    def max_drawdown(self):
+        return np.max(1 - self.curve / np.maximum.accumulate(self.curve, axis=0), axis=0, initial=0.0)
+
+    def sharpe(self):
+        returns = self.returns()
+        if len(returns) < 2:
+            return np.zeros(self.curve.shape[1])
+        std = returns.std(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(std > 0, returns.mean(axis=0) / std * np.sqrt(252), 0.0)
+
+    def calmar(self):
+        total_return = self.curve[-1] / INITIAL_EQUITY - 1 if len(self.curve) else np.zeros(self.curve.shape[1])
+        drawdown = self.max_drawdown()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(drawdown > 0, total_return / drawdown, 0.0)
+
+    def final_equity(self):
+        # The P&L-marked value at the last close, unlike the booked `equity`
+        return self.curve[-1] if len(self.curve) else self.capital.copy()
+
+    def score(self, name="equity"):
+        if name == "equity":
+            return self.equity
+        if name == "final_equity":
+            return self.final_equity()
+        if name == "sharpe":
+            return self.sharpe()
+        if name == "calmar":
+            return self.calmar()
+        raise ValueError(f"Unknown training score: {name}")
+
+
+def regime_weights(codes, allocations, leverage):
+    # RunTraining's per-day sleeve weights for an array of regime codes: each sleeve's allocation
+    # times its leverage (the pairs weight split over the two legs) and the regime's vol_limit
+    return {"forex_weight": np.array([allocations[name]["Forex"] * leverage["Forex"] for name in REGIMES])[codes],
+            "pair_weight": np.array([allocations[name]["EquityPair"] * leverage["EquityPair"] / 2 for name in REGIMES])[codes],
+            "vol_limit": np.array([0.03 if name in ["Recovery", "Reflation"] else 0.02 for name in REGIMES])[codes]}
+
+
+def simulate_grid(days, z_score_entry, momentum_threshold, atr_multiplier, pairs_trailing_stop, forex_weight, pair_weight, vol_limit,
+                  drawdown_limit=np.inf):
+    # Final booked simulated_equity of every combination
+    return simulate_portfolio(days, z_score_entry, momentum_threshold, atr_multiplier, pairs_trailing_stop, forex_weight, pair_weight,
+                              vol_limit, drawdown_limit).equity
+
+
+def simulate_portfolio(days, z_score_entry, momentum_threshold, atr_multiplier, pairs_trailing_stop, forex_weight, pair_weight, vol_limit,
+                       drawdown_limit=np.inf):
+    # Every parameter combination is a row of one SimulatedPortfolio, stepped a calendar day at a time.
+    # Sleeve weights and vol_limit may be per-day arrays (e.g. following the regime timeline); a
+    # finite drawdown_limit applies OnData's daily drawdown liquidation and 5-day pause per column.
+    z_score_entry, momentum_threshold, atr_multiplier, pairs_trailing_stop, drawdown_limit = np.broadcast_arrays(
+        *[np.atleast_1d(np.asarray(p, dtype=float))
+          for p in (z_score_entry, momentum_threshold, atr_multiplier, pairs_trailing_stop, drawdown_limit)])
+    k = len(z_score_entry)
+    forex_weight, pair_weight, vol_limit = [np.broadcast_to(np.asarray(p, dtype=float), (len(days),)) for p in (forex_weight, pair_weight, vol_limit)]
+    track_drawdown = np.isfinite(drawdown_limit).any()
+    active = np.ones(k, dtype=bool)
+    pause_days = np.zeros(k, dtype=int)
+    day_start_value = np.full(k, float(INITIAL_EQUITY))
+    portfolio = SimulatedPortfolio(k, len(days))
+    # Per-symbol column views into the portfolio arrays
+    forex_dir, nvda_dir = portfolio.direction[:, FOREX], portfolio.direction[:, NVDA]
+    forex_entry = portfolio.entry[:, FOREX]
+    spread_high = np.full(k, np.nan)
+    nvda_high = np.full(k, np.nan)
+    amd_high = np.full(k, np.nan)
+
+    for t in range(len(days)):
+        vix_ok = days.vix_momentum[t] < 0.15 and days.vix_value[t] < 50
+        marks = days.closes[t]
+        forex_price, nvda_price, amd_price = marks
+
+        if track_drawdown:
+            paused = pause_days > 0
+            pause_days[paused] -= 1
+            with np.errstate(divide="ignore", invalid="ignore"):
+                drawdown = (day_start_value - portfolio.value(marks)) / day_start_value
+            breach = ~paused & (drawdown > drawdown_limit)
+            if breach.any():
+                portfolio.close(breach, [FOREX, NVDA, AMD], marks)
+                portfolio.book(breach, marks)
+                pause_days[breach] = 5
+            active = ~paused & ~breach
+
+        if days.forex_ready[t]:
+            momentum = days.momentum[t]
+            with np.errstate(invalid="ignore"):
+                change = np.abs(forex_price - forex_entry) / forex_entry
+                stop = active & (forex_dir != 0) & (forex_entry != 0) & (change >= atr_multiplier * days.atr[t])
+            if stop.any():
+                portfolio.close(stop, [FOREX], marks)
+            signal = days.sma_short[t] > days.sma_long[t] if momentum > 0 else days.sma_short[t] < days.sma_long[t]
+            if vix_ok and signal and days.volatility[t] < vol_limit[t]:
+                enter = active & (forex_dir == 0) & (abs(momentum) > momentum_threshold)
+                if enter.any():
+                    portfolio.open(enter, FOREX, 1.0 if momentum > 0 else -1.0, forex_weight[t], forex_price, marks)
+                    portfolio.book(enter, marks)
+
+        if days.pairs_ready[t]:
+            z = days.z_score[t]
+            held = active & (nvda_dir != 0)
+            if held.any():
+                spread_high[held] = np.fmax(spread_high[held], abs(z))
+                nvda_high[held] = np.fmax(nvda_high[held], nvda_price)
+                amd_high[held] = np.fmax(amd_high[held], amd_price)
+                with np.errstate(invalid="ignore"):
+                    exit_z = held & ((abs(z) > 3) | (abs(z) < spread_high * 0.95) | (abs(z) < 0.05))
+                    exit_stop = held & ~exit_z & ((nvda_price < nvda_high * (1 - pairs_trailing_stop)) | (amd_price < amd_high * (1 - pairs_trailing_stop)))
+                # The trailing-stop exit leaves spread_high in place, as the live OnData path does
+                for exit_mask, clear_spread_high in ((exit_z, True), (exit_stop, False)):
+                    if exit_mask.any():
+                        portfolio.close(exit_mask, [NVDA, AMD], marks)
+                        nvda_high[exit_mask] = np.nan
+                        amd_high[exit_mask] = np.nan
+                        if clear_spread_high:
+                            spread_high[exit_mask] = np.nan
+                        portfolio.book(exit_mask, marks)
+            if vix_ok and days.spread_vol[t] < 1.5:
+                enter = active & (nvda_dir == 0) & (abs(z) > z_score_entry)
+                if enter.any():
+                    # z above the entry threshold is LongAMDShortNVDA, otherwise LongNVDAShortAMD
+                    direction = np.where(z > z_score_entry[enter], -1.0, 1.0)
+                    portfolio.open(enter, NVDA, direction, pair_weight[t], nvda_price, marks)
+                    portfolio.open(enter, AMD, -direction, pair_weight[t], amd_price, marks)
+                    nvda_high[enter] = nvda_price
+                    amd_high[enter] = amd_price
+                    portfolio.book(enter, marks)
+
+        day_start_value = portfolio.record(t, marks)
+
+    return portfolio
@@ -0,0 +1,85 @@
+import hashlib
+import io
+import json
+import numpy as np
+from training import SimulatedPortfolio
+
+# Part of every fingerprint; bump it when the simulation changes so older entries stop matching
+CACHE_VERSION = 2
+
+
+def fingerprint(*parts):
+    # SHA-256 over the parts in order: arrays by dtype, shape and bytes, dicts by key, anything
+    # else by its JSON (or str) form
+    digest = hashlib.sha256(str(CACHE_VERSION).encode())
+
+    def feed(part):
+        if isinstance(part, np.ndarray):
+            part = np.ascontiguousarray(part)
+            digest.update(f"{part.dtype.str}{part.shape}".encode())
+            digest.update(part.tobytes())
+        elif isinstance(part, dict):
+            for key in sorted(part):
+                digest.update(str(key).encode())
+                feed(part[key])
+        else:
+            digest.update(json.dumps(part, default=str).encode())
+
+    for part in parts:
+        feed(part)
+    return digest.hexdigest()
+
+
+class TrainingCache:
+    # Training grid results in the ObjectStore, one `<key>/<fingerprint>` entry per training run
+    # holding the final booked equity and daily equity curve of every combination (npz bytes),
+    # plus a `<key>/index` listing the fingerprints least recently used first. Past `capacity`
+    # entries the least recently used are deleted.
+    def __init__(self, object_store, key="Training_Cache", capacity=16):
+        self.object_store = object_store
+        self.key = key
+        self.capacity = max(1, capacity)
+        self.hits = 0
+        self.misses = 0
+
+    def entry_key(self, fingerprint):
+        return f"{self.key}/{fingerprint}"
+
+    @property
+    def index_key(self):
+        return f"{self.key}/index"
+
+    def read_index(self):
+        if self.object_store.ContainsKey(self.index_key):
+            return json.loads(self.object_store.Read(self.index_key))
+        return []
+
+    def write_index(self, index):
+        self.object_store.Save(self.index_key, json.dumps(index))
+
+    def get(self, fingerprint):
+        # The cached SimulatedPortfolio (equity and curve filled in), or None
+        index = self.read_index()
+        if fingerprint not in index or not self.object_store.ContainsKey(self.entry_key(fingerprint)):
+            self.misses += 1
+            return None
+        with np.load(io.BytesIO(bytes(self.object_store.ReadBytes(self.entry_key(fingerprint))))) as arrays:
+            equity, curve = arrays["equity"], arrays["curve"]
+        portfolio = SimulatedPortfolio(len(equity), len(curve))
+        portfolio.equity[:] = equity
+        portfolio.curve[:] = curve
+        index.remove(fingerprint)
+        index.append(fingerprint)
+        self.write_index(index)
+        self.hits += 1
+        return portfolio
+
+    def put(self, fingerprint, portfolio):
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, equity=portfolio.equity, curve=portfolio.curve)
+        self.object_store.SaveBytes(self.entry_key(fingerprint), buffer.getvalue())
+        index = [entry for entry in self.read_index() if entry != fingerprint] + [fingerprint]
+        for evicted in index[:-self.capacity]:
+            if self.object_store.ContainsKey(self.entry_key(evicted)):
+                self.object_store.Delete(self.entry_key(evicted))
+        self.write_index(index[-self.capacity:])